@@ -1,144 +1,237 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 from datetime import date
 import hashlib
 import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots 
 import time
+import threading
+import functools
+from connessione import apri_archivio, apri_foglio
+from diario import Diario
+from importazione import ImportazioneRiprendibile, TokenBucket, analizza_file, righe_file, righe_da_frame, firma_importazione
+import statistiche
+import grafici
+import simulazione
+import metriche
 
 # --- CONFIGURAZIONE ---
 st.set_page_config(page_title="Poker Club", page_icon="♣️", layout="centered")
 
-# COSTANTI
-SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-CREDENTIALS_FILE = "credentials.json"
-SHEET_NAME = "PokerDB"
-
 # --- CONNESSIONE GOOGLE SHEETS (Con Cache Risorse) ---
 @st.cache_resource
 def get_connection():
     try:
-        creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_FILE, SCOPE)
-        client = gspread.authorize(creds)
-        sheet = client.open(SHEET_NAME)
-        return sheet
+        return apri_foglio()
     except Exception as e:
         st.error(f"Errore connessione Google Sheets: {e}")
         st.stop()
 
+@st.cache_resource
+def get_archivio():
+    return apri_archivio(get_connection())
+
+# Unico limitatore per processo: la quota di Google Sheets è condivisa da tutte le sessioni
+@st.cache_resource
+def get_limitatore():
+    return TokenBucket()
+
 # --- INIT DB ---
+# Una sola lettura a lotti all'avvio: riempie gli specchi di Utenti, Club e partizioni
+# (quindi indici e statistiche partono senza altre letture) e controlla le intestazioni
 @st.cache_resource
 def init_db():
     try:
-        sheet = get_connection()
-        ws_users = sheet.worksheet("Utenti")
-        if not ws_users.row_values(1): ws_users.append_row(["Username", "Password"])
-        ws_clubs = sheet.worksheet("Club")
-        if not ws_clubs.row_values(1): ws_clubs.append_row(["NomeClub", "Owner", "Membri"])
-        ws_games = sheet.worksheet("Partite")
-        if not ws_games.row_values(1): ws_games.append_row(["Data", "Giocatore", "BuyIn", "CashOut", "Profitto", "Club"])
+        archivio = get_archivio()
+        intestazioni = archivio.avvia(intestazioni=["Partite"])
+        for nome, header in [("Utenti", ["Username", "Password"]), ("Club", ["NomeClub", "Owner", "Membri"])]:
+            if not archivio.specchio(nome).header:
+                archivio.foglio(nome).append_row(header)
+                archivio.specchio(nome).invalida()
+        if not intestazioni.get("Partite"): archivio.foglio("Partite").append_row(["Data", "Giocatore", "BuyIn", "CashOut", "Profitto", "Club"])
     except Exception as e:
         time.sleep(1)
 
+# --- INVALIDAZIONE MIRATA ---
+# Ogni loader in cache dipende da una chiave (es. ("partite", club)) e riceve la sua
+# versione come argomento. Una scrittura dichiara le chiavi che invalida: la loro versione
+# sale e solo quei loader vengono ricalcolati, gli altri club restano in cache.
+
+def cache_partite(club_name):
+    return ("partite", club_name)
+
+@st.cache_resource
+def _registro_versioni():
+    return {"lock": threading.Lock(), "versioni": {}}
+
+def versione_cache(chiave):
+    return _registro_versioni()["versioni"].get(chiave, 0)
+
+def invalida_cache(*chiavi):
+    registro = _registro_versioni()
+    with registro["lock"]:
+        for chiave in chiavi:
+            registro["versioni"][chiave] = registro["versioni"].get(chiave, 0) + 1
+
+def invalida_dopo(*chiavi):
+    # Le chiavi possono essere tuple o funzioni degli argomenti della scrittura
+    def decoratore(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            esito = func(*args, **kwargs)
+            invalida_cache(*[c(*args, **kwargs) if callable(c) else c for c in chiavi])
+            return esito
+        return wrapper
+    return decoratore
+
+# --- CACHE MISURATA ---
+# st.cache_data che conta hit e miss nelle metriche del rerun: il corpo della funzione
+# gira solo quando Streamlit non ha il risultato in cache. Con cache=st.cache_resource
+# il risultato è condiviso per riferimento invece di essere copiato a ogni lettura.
+def cache_misurata(cache=st.cache_data, **opzioni):
+    def decoratore(func):
+        @functools.wraps(func)
+        def calcola(*args, **kwargs):
+            metriche.corrente().esito_cache(func.__name__, hit=False)
+            return func(*args, **kwargs)
+        in_cache = cache(**opzioni)(calcola)
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            misure = metriche.corrente()
+            miss = misure.cache[func.__name__][1]
+            with metriche.fase(f"cache:{func.__name__}"): risultato = in_cache(*args, **kwargs)
+            if misure.cache[func.__name__][1] == miss: misure.esito_cache(func.__name__, hit=True)
+            return risultato
+        wrapper.clear = in_cache.clear
+        return wrapper
+    return decoratore
+
 # --- BACKEND CACHED ---
 def hash_password(password):
     return hashlib.sha256(str.encode(password)).hexdigest()
 
-@st.cache_data(ttl=600)
-def carica_utenti():
-    sheet = get_connection()
-    ws = sheet.worksheet("Utenti")
-    records = ws.get_all_records()
-    users_dict = {}
-    for r in records:
-        users_dict[str(r["Username"])] = {"password": str(r["Password"])}
-    return users_dict
-
 def crea_utente(username, password):
-    users = carica_utenti()
-    if username in users: return False
-    sheet = get_connection()
-    ws = sheet.worksheet("Utenti")
-    ws.append_row([username, hash_password(password)])
-    st.cache_data.clear()
-    return True
+    # L'utente entra nell'indice senza invalidare nulla
+    return get_archivio().registra_utente(username, hash_password(password))
 
 def verifica_login(username, password):
-    users = carica_utenti()
-    if username in users and users[username]["password"] == hash_password(password):
-        return True
-    return False
-
-@st.cache_data(ttl=60)
-def carica_clubs():
-    sheet = get_connection()
-    ws = sheet.worksheet("Club")
-    records = ws.get_all_records()
-    clubs_dict = {}
-    for r in records:
-        members_list = str(r["Membri"]).split(",") if r["Membri"] else []
-        clubs_dict[str(r["NomeClub"])] = {"owner": str(r["Owner"]), "members": members_list}
-    return clubs_dict
+    registrato = get_archivio().utenti().cerca(username)
+    return registrato is not None and registrato == hash_password(password)
 
 def crea_club(nome_club, owner):
-    st.cache_data.clear() 
-    clubs = carica_clubs()
-    if nome_club in clubs: return False
-    sheet = get_connection()
-    ws = sheet.worksheet("Club")
-    ws.append_row([nome_club, owner, owner]) 
-    st.cache_data.clear()
-    return True
+    return get_archivio().crea_club(nome_club, owner)
 
 def get_user_clubs(username):
-    all_clubs = carica_clubs()
-    return [name for name, data in all_clubs.items() if username in data["members"]]
+    return get_archivio().clubs().clubs_di(username)
 
 def get_club_owner(club_name):
-    clubs = carica_clubs()
-    return clubs[club_name]["owner"] if club_name in clubs else None
-
-def aggiungi_membro_al_club(club_name, new_member_username):
-    users = carica_utenti()
-    if new_member_username not in users: return "not_found"
-    sheet = get_connection()
-    ws = sheet.worksheet("Club")
-    cell = ws.find(club_name)
-    if not cell: return "error"
-    row_idx = cell.row
-    current_members_str = ws.cell(row_idx, 3).value 
-    current_members = current_members_str.split(",") if current_members_str else []
-    if new_member_username in current_members: return "already_in"
-    current_members.append(new_member_username)
-    new_members_str = ",".join(current_members)
-    ws.update_cell(row_idx, 3, new_members_str)
-    st.cache_data.clear()
-    return "success"
-
-@st.cache_data(ttl=60)
-def carica_dati_club(club_name):
-    sheet = get_connection()
-    ws = sheet.worksheet("Partite")
-    data = ws.get_all_records()
-    df = pd.DataFrame(data)
-    if df.empty: return pd.DataFrame()
-    if "Club" in df.columns:
-        df = df[df["Club"] == club_name].copy()
-    return df
-
+    club = get_archivio().clubs().dati(club_name)
+    return club["owner"] if club else None
+
+def get_club_members(club_name):
+    club = get_archivio().clubs().dati(club_name)
+    return club["members"] if club else []
+
+def aggiungi_membri_al_club(club_name, usernames):
+    # {username: "success" | "already_in" | "not_found" | "error"}, un solo update per tutto il gruppo
+    utenti = get_archivio().utenti()
+    esito = {u: "not_found" for u in usernames if utenti.cerca(u) is None}
+    validi = [u for u in usernames if u not in esito]
+    if validi:
+        esito.update(get_archivio().invita(club_name, validi) or {u: "error" for u in validi})
+    return esito
+
+@invalida_dopo(lambda club_name, *_: cache_partite(club_name))
 def salva_partita(club_name, dati_sessione_df):
-    sheet = get_connection()
-    ws = sheet.worksheet("Partite")
-    rows_to_add = []
-    for index, row in dati_sessione_df.iterrows():
-        r = [str(row["Data"]), row["Giocatore"], float(row["BuyIn"]), float(row["CashOut"]), float(row["Profitto"]), club_name]
-        rows_to_add.append(r)
+    # Restituisce quante righe erano già sul foglio (es. doppio click su SALVA) e sono state saltate
+    righe = righe_da_frame(dati_sessione_df, club_name)
+    nuova = get_archivio().filtro_duplicati(club_name)
+    rows_to_add = [r for r in righe if nuova(r)]
     if rows_to_add:
-        ws.append_rows(rows_to_add)
-        st.cache_data.clear()
+        get_archivio().scrivi_partite(club_name, rows_to_add)
+    return len(righe) - len(rows_to_add)
+
+# Un solo diario e un solo flusher per processo
+@st.cache_resource
+def get_diario():
+    diario = Diario()
+    diario.avvia(salva_partita)
+    return diario
+
+# --- ISTANTANEA STATISTICHE (condivisa tra sessioni) ---
+# Un cubo per club e per processo: tabella canonica e aggregati anno/mese, aggiornati
+# in modo incrementale quando arrivano righe nuove. Il cubo non si copia: le sue tabelle
+# vengono sostituite, mai modificate, quindi chi ha letto una versione non la vede cambiare
+@st.cache_resource
+def get_cubo(club_name):
+    return statistiche.CuboPartite(get_archivio().specchio_partite(club_name))
+
+def cubo_club(club_name):
+    return _cubo_club(club_name, versione_cache(cache_partite(club_name)))
+
+@cache_misurata(cache=st.cache_resource, ttl=60)
+def _cubo_club(club_name, versione):
+    return get_cubo(club_name).aggiorna()
+
+def istantanea_club(club_name, anno=None, mese=None):
+    return _istantanea_club(club_name, versione_cache(cache_partite(club_name)), anno, mese)
+
+# Come il cubo, l'istantanea è condivisa per riferimento: contiene la tabella filtrata
+# del periodo e nessuno la modifica, quindi copiarla a ogni rerun non serve
+@cache_misurata(cache=st.cache_resource, ttl=60, max_entries=500)
+def _istantanea_club(club_name, versione, anno, mese):
+    cubo = cubo_club(club_name)
+    if cubo["partite"].empty: return None
+    return statistiche.istantanea(cubo, anno, mese)
+
+# --- CLASSIFICA GLOBALE ---
+# Solo i club dell'utente, dalle righe già negli specchi (avvio a lotti, visite alle pagine
+# dei club): la home non crea partizioni e legge Sheets solo per i club in cui questo
+# processo ha salvato qualcosa dall'ultima volta (la loro versione è cambiata), con un
+# delta ciascuno. La chiave è versione e stato dello specchio di ogni club, quindi il
+# raggruppamento si rifà solo quando arrivano righe nuove.
+@st.cache_resource
+def _versioni_classifica():
+    return {}
+
+def classifica_globale(username):
+    # (totale, dettaglio per club, club esclusi perché non ancora caricati)
+    viste = _versioni_classifica()
+    stati = []
+    for c in sorted(get_user_clubs(username)):
+        versione = versione_cache(cache_partite(c))
+        if viste.get(c, 0) != versione:
+            get_cubo(c).aggiorna()
+            viste[c] = versione
+        stati.append((c, versione) + get_cubo(c).versione())
+    esclusi = [c for c, _, generazione, _ in stati if generazione == 0]
+    return _classifica_globale(tuple(stati)) + (esclusi,)
+
+@cache_misurata(ttl=60)
+def _classifica_globale(stati):
+    return statistiche.classifica_globale([get_cubo(c).attuale()["partite"] for c, *_ in stati])
+
+# --- PROIEZIONI MONTE CARLO ---
+# Seme fisso: la stessa storia dà sempre la stessa proiezione. Soglia di drawdown e
+# bankroll non sono nella chiave, sono ricerche sul risultato già simulato.
+@cache_misurata(ttl=600, max_entries=200)
+def proiezione(profitti, sessioni, percorsi=simulazione.PERCORSI):
+    return simulazione.simula(profitti, sessioni, percorsi, seme=0)
+
+def testa_a_testa_club(club_name, anno, mese):
+    return _testa_a_testa_club(club_name, versione_cache(cache_partite(club_name)), anno, mese)
+
+@cache_misurata(ttl=600, max_entries=100)
+def _testa_a_testa_club(club_name, versione, anno, mese):
+    matrici = statistiche.matrici_tavolo(istantanea_club(club_name, anno, mese)["partite"])
+    return statistiche.testa_a_testa(matrici) if matrici else None
+
+def rischio_club(club_name, anno, mese, sessioni, soglia, bankroll):
+    return _rischio_club(club_name, versione_cache(cache_partite(club_name)), anno, mese, sessioni, soglia, bankroll)
+
+@cache_misurata(ttl=600, max_entries=100)
+def _rischio_club(club_name, versione, anno, mese, sessioni, soglia, bankroll):
+    partite = istantanea_club(club_name, anno, mese)["partite"]
+    return simulazione.simula_club(partite, sessioni, soglia=soglia, bankroll=bankroll, seme=0)
 
 # --- IMPORTAZIONE MODIFICATA (Strategia Mista) ---
 def importa_dati(club_name):
@@ -149,93 +242,47 @@ def importa_dati(club_name):
     
     if uploaded_file:
         try:
-            # 1. NON usiamo dtype=str per tutto. Lasciamo che Pandas capisca le date da solo.
-            if uploaded_file.name.endswith('.csv'): 
-                df_new = pd.read_csv(uploaded_file)
-            else: 
-                df_new = pd.read_excel(uploaded_file)
-            
-            # Pulizia nomi colonne
-            df_new.columns = [c.strip() for c in df_new.columns]
-            cols_lower = {c.lower(): c for c in df_new.columns}
-            
-            rename_map = {}
-            if "nome del giocatore" in cols_lower: rename_map[cols_lower["nome del giocatore"]] = "Giocatore"
-            elif "giocatore" in cols_lower: rename_map[cols_lower["giocatore"]] = "Giocatore"
-            if "entrata" in cols_lower: rename_map[cols_lower["entrata"]] = "BuyIn"
-            elif "buyin" in cols_lower: rename_map[cols_lower["buyin"]] = "BuyIn"
-            for col in cols_lower:
-                if "uscita" in col or "cashout" in col:
-                    rename_map[cols_lower[col]] = "CashOut"
-                    break
-            if "data" in cols_lower: rename_map[cols_lower["data"]] = "Data"
-            
-            df_new = df_new.rename(columns=rename_map)
-            
-            # 2. PULIZIA NUMERI (Convertiamo a stringa SOLO ORA per pulire)
-            def clean_number_italy(x):
-                # Forziamo a stringa per analizzare virgole e punti
-                s = str(x).strip()
-                if s == "nan" or s == "": return 0.0
-                
-                s = s.replace("€", "").strip()
-                s = s.replace("-", "0")
-                
-                # Se c'è la virgola, è un decimale italiano (17,50)
-                if "," in s:
-                    s = s.replace(".", "") # Via i punti delle migliaia
-                    s = s.replace(",", ".") # Virgola diventa punto
-                return float(s)
-
-            for col in ["BuyIn", "CashOut"]:
-                df_new[col] = df_new[col].apply(clean_number_italy)
-
-            df_new["Profitto"] = df_new["CashOut"] - df_new["BuyIn"]
-            
-            # 3. DATE (Lasciamo che Pandas faccia la magia, poi forziamo il formato)
-            # errors='coerce' metterà NaT se proprio non capisce, ma senza dtype=str dovrebbe capire quasi tutto
-            df_new["Data"] = pd.to_datetime(df_new["Data"], dayfirst=True, errors='coerce')
-            
-            # Check righe perse
-            righe_totali = len(df_new)
-            df_new = df_new.dropna(subset=["Data"])
-            righe_valide = len(df_new)
+            # Primo passaggio a blocchi: conteggi e anteprima, senza tenere in memoria tutto il file
+            uploaded_file.seek(0)
+            righe_valide, righe_scartate, righe_presenti, anteprima = analizza_file(uploaded_file, uploaded_file.name, club_name, get_archivio().filtro_duplicati(club_name))
             
-            if righe_valide < righe_totali:
-                st.warning(f"⚠️ Attenzione: {righe_totali - righe_valide} righe ignorate per data non valida.")
-            
-            # Convertiamo in stringa YYYY-MM-DD per Google Sheets
-            df_new["Data"] = df_new["Data"].dt.strftime('%Y-%m-%d')
+            if righe_scartate:
+                st.warning(f"⚠️ Attenzione: {righe_scartate} righe ignorate per data non valida.")
+            if righe_presenti:
+                st.info(f"🔁 {righe_presenti} righe sono già presenti nel club e verranno saltate.")
 
-            st.write(f"Anteprima ({righe_valide} righe pronte):")
-            st.dataframe(df_new.head())
+            st.write(f"Anteprima ({righe_valide} righe pronte: {righe_valide - righe_presenti} nuove, {righe_presenti} già presenti):")
+            st.dataframe(anteprima)
             
             if st.button("✅ Conferma Importazione"):
-                sheet = get_connection()
-                ws = sheet.worksheet("Partite")
-                
-                all_rows = []
-                for index, row in df_new.iterrows():
-                    r = [str(row["Data"]), row["Giocatore"], float(row["BuyIn"]), float(row["CashOut"]), float(row["Profitto"]), club_name]
-                    all_rows.append(r)
+                # Secondo passaggio a blocchi: le righe vanno sul foglio man mano che vengono lette
+                uploaded_file.seek(0)
+                all_rows = righe_file(uploaded_file, uploaded_file.name, club_name)
+                firma = firma_importazione(club_name, uploaded_file.getvalue())
                 
-                # CARICAMENTO A BLOCCHI
-                chunk_size = 50
-                progress_bar = st.progress(0)
-                total_rows = len(all_rows)
+                # CARICAMENTO A BLOCCHI (ritmo adattivo, retry e ripresa dal checkpoint)
+                importazione = ImportazioneRiprendibile(get_archivio().partizione(club_name), firma, all_rows, righe_valide, get_limitatore(), filtro=get_archivio().filtro_duplicati(club_name))
+                progress_bar = st.progress(importazione.fatte / max(importazione.totale, 1))
+                total_rows = importazione.totale
                 status_text = st.empty()
+                if importazione.ripresa:
+                    st.info(f"↩️ Ripresa importazione precedente da riga {importazione.fatte + 1} di {total_rows}.")
                 
-                for i in range(0, total_rows, chunk_size):
-                    chunk = all_rows[i:i + chunk_size]
-                    ws.append_rows(chunk)
-                    progress = min((i + chunk_size) / total_rows, 1.0)
+                def aggiorna_progresso(fatte, totale):
+                    progress = min(fatte / totale, 1.0)
                     progress_bar.progress(progress)
                     status_text.text(f"Caricamento: {int(progress*100)}%...")
-                    time.sleep(1.5)
+                
+                try:
+                    importazione.esegui(aggiorna_progresso)
+                except Exception as e:
+                    invalida_cache(cache_partite(club_name))
+                    st.error(f"Importazione interrotta dopo {importazione.fatte} righe su {total_rows}: {e}. Premi di nuovo Conferma per riprendere.")
+                    return
                 
                 status_text.text("✅ Fatto!")
-                st.success(f"Caricate {total_rows} righe con successo!")
-                st.cache_data.clear()
+                st.success(f"Caricate {total_rows - importazione.saltate} righe con successo! ({importazione.saltate} già presenti saltate)")
+                invalida_cache(cache_partite(club_name))
                 time.sleep(1)
                 st.rerun()
                     
@@ -243,16 +290,20 @@ def importa_dati(club_name):
             st.error(f"Errore: {e}")
 
 # --- FRONTEND ---
+misure = metriche.inizia()
 if "logged_in" not in st.session_state: st.session_state.logged_in = False
 if "username" not in st.session_state: st.session_state.username = None
 if "current_club" not in st.session_state: st.session_state.current_club = None
-if "session_data" not in st.session_state: st.session_state.session_data = []
 
 try:
     init_db()
 except:
     pass
 
+# Diario e flusher partono con l'app: le sessioni chiuse prima di un riavvio vengono
+# inviate subito, senza aspettare che un host apra "Partita in Corso"
+get_diario()
+
 def login_page():
     st.title("♣️ Poker Hub (Cloud Edition)")
     tab1, tab2 = st.tabs(["Accedi", "Registrati"])
@@ -276,12 +327,13 @@ def gestisci_partita_live(club_name, is_host):
         st.info("🔒 Solo l'Host può inserire i dati.")
         return
 
-    df_session = pd.DataFrame(st.session_state.session_data)
-    if df_session.empty:
-        df_session = pd.DataFrame(columns=["Data", "Giocatore", "BuyIn", "CashOut", "Profitto"])
+    # Il tavolo vive nel diario su disco: sopravvive a refresh del browser e riavvii
+    diario = get_diario()
+    host = st.session_state.username
+    sessione = diario.sessione_aperta(club_name, host)
+    df_session = diario.righe(sessione) if sessione else diario.righe()
 
-    clubs = carica_clubs()
-    membri = clubs[club_name]["members"]
+    membri = get_club_members(club_name)
 
     with st.expander("Aggiungi Risultato", expanded=True):
         col_data, col_vuota = st.columns([1, 1])
@@ -297,52 +349,56 @@ def gestisci_partita_live(club_name, is_host):
         if st.button("➕ Aggiungi alla lista"):
             profit = p_cashout - p_buyin
             new_row = {"Data": data_selezionata, "Giocatore": p_name, "BuyIn": p_buyin, "CashOut": p_cashout, "Profitto": profit}
-            st.session_state.session_data.append(new_row)
+            diario.aggiungi_riga(club_name, host, new_row)
             st.rerun()
 
     if not df_session.empty:
         st.write("### Riepilogo Provvisorio")
         st.dataframe(df_session.style.format({"BuyIn": "€{:.2f}", "CashOut": "€{:.2f}", "Profitto": "€{:.2f}"}), use_container_width=True)
-        tot_profit = df_session["Profitto"].sum()
-        if tot_profit != 0: st.warning(f"⚠️ Discrepanza: {tot_profit}€")
+        # In centesimi: il controllo a somma zero è esatto
+        tot_profit = statistiche.centesimi(df_session["Profitto"]).sum()
+        if tot_profit != 0: st.warning(f"⚠️ Discrepanza: {tot_profit / 100:.2f}€")
         else: st.success("✅ Conti perfetti.")
         
         if st.button("💾 SALVA SESSIONE SU GOOGLE SHEETS", type="primary"):
-            salva_partita(club_name, df_session)
-            st.session_state.session_data = []
+            # L'invio lo fa il flusher in background: la UI non aspetta Google Sheets
+            diario.chiudi(sessione)
             st.balloons()
-            st.success("Salvato nel Cloud!")
+            st.success("Sessione chiusa, invio al Cloud in corso!")
             st.rerun()
 
+    pendenti = diario.in_attesa(club_name)
+    if not pendenti.empty:
+        st.info(f"⏳ {len(pendenti)} sessioni in attesa di invio a Google Sheets.")
+        st.dataframe(pendenti, hide_index=True, use_container_width=True)
+    ultima = diario.ultima_inviata(club_name)
+    if ultima and ultima[2]:
+        st.caption(f"🔁 Ultimo invio: {ultima[2]} righe erano già salvate e non sono state duplicate.")
+
 def mostra_statistiche(club_name, is_host):
-    df = carica_dati_club(club_name)
-    if df.empty:
+    storico = istantanea_club(club_name)
+    if storico is None:
         st.info("Nessuna partita registrata in questo club.")
         return
-    
-    df["Data"] = pd.to_datetime(df["Data"], errors='coerce')
-    df["BuyIn"] = pd.to_numeric(df["BuyIn"], errors='coerce').fillna(0)
-    df["CashOut"] = pd.to_numeric(df["CashOut"], errors='coerce').fillna(0)
-    df["Profitto"] = pd.to_numeric(df["Profitto"], errors='coerce').fillna(0)
-    df = df.dropna(subset=["Data"])
 
     st.header("📊 Centro Analisi")
     col_filter_1, col_filter_2 = st.columns(2)
     with col_filter_1:
-        anni_disponibili = sorted(df["Data"].dt.year.unique(), reverse=True)
+        anni_disponibili = sorted(storico["periodi"], reverse=True)
         opzioni_anno = ["Tutto lo Storico (All Time)"] + [str(a) for a in anni_disponibili]
         filtro_anno = st.selectbox("📅 Seleziona Periodo", opzioni_anno)
     
-    df_filtered = df.copy()
+    snap = storico
+    anno_sel = mese_sel = None
     if filtro_anno != "Tutto lo Storico (All Time)":
         anno_sel = int(filtro_anno)
-        df_filtered = df_filtered[df_filtered["Data"].dt.year == anno_sel]
         with col_filter_2:
-            mesi_disponibili = sorted(df_filtered["Data"].dt.month.unique())
+            mesi_disponibili = storico["periodi"].get(anno_sel, [])
             opzioni_mese = ["Tutto l'Anno"] + [str(m) for m in mesi_disponibili]
             filtro_mese = st.selectbox("Mese (Opzionale)", opzioni_mese)
-            if filtro_mese != "Tutto l'Anno":
-                df_filtered = df_filtered[df_filtered["Data"].dt.month == int(filtro_mese)]
+            mese_sel = int(filtro_mese) if filtro_mese != "Tutto l'Anno" else None
+        snap = istantanea_club(club_name, anno_sel, mese_sel)
+    df_filtered = snap["partite"]
     
     if df_filtered.empty:
         st.warning("Nessuna partita trovata nel periodo selezionato.")
@@ -350,7 +406,7 @@ def mostra_statistiche(club_name, is_host):
     
     tab_pers, tab_club = st.tabs(["👤 Statistiche Personali", "🏆 Statistiche Globali Club"])
     with tab_pers:
-        tutti_giocatori = sorted(df["Giocatore"].unique())
+        tutti_giocatori = list(storico["riepilogo"].index)
         if is_host:
             options = tutti_giocatori
             default_idx = 0
@@ -362,72 +418,32 @@ def mostra_statistiche(club_name, is_host):
             st.warning("Nessuna statistica disponibile.")
         else:
             selected_player = st.selectbox("Analizza Giocatore:", options, index=default_idx)
-            all_dates = sorted(df_filtered["Data"].unique())
-            full_timeline = pd.DataFrame({"Data": all_dates})
-            player_data = df_filtered[df_filtered["Giocatore"] == selected_player].copy()
-            df_p = pd.merge(full_timeline, player_data, on="Data", how="left")
-            df_p["Giocatore"] = selected_player
-            df_p["Profitto"] = df_p["Profitto"].fillna(0)
-            df_p["BuyIn"] = df_p["BuyIn"].fillna(0)
-            df_p = df_p.sort_values("Data")
-            df_active = df_p[df_p["BuyIn"] > 0].copy() 
+            with metriche.fase("statistiche:giocatore"):
+                all_dates = snap["date"]
+                full_timeline = pd.DataFrame({"Data": all_dates})
+                player_data = statistiche.in_euro(df_filtered[df_filtered["Giocatore"] == selected_player])
+                df_p = pd.merge(full_timeline, player_data, on="Data", how="left")
+                df_p["Giocatore"] = selected_player
+                df_p["Profitto"] = df_p["Profitto"].fillna(0)
+                df_p["BuyIn"] = df_p["BuyIn"].fillna(0)
+                df_p = df_p.sort_values("Data")
+                df_active = df_p[df_p["BuyIn"] > 0].copy() 
             
-            if df_active.empty and df_p["Profitto"].sum() == 0:
+            riepilogo = snap["riepilogo"]
+            if selected_player not in riepilogo.index or (riepilogo.loc[selected_player, "Sessioni"] == 0 and riepilogo.loc[selected_player, "Bilancio"] == 0):
                 st.warning(f"Nessuna partita giocata per {selected_player}.")
             else:
-                total_profit = df_p["Profitto"].sum()
-                total_buyin = df_active["BuyIn"].sum()
-                n_sessions_played = len(df_active)
-                total_club_sessions = len(all_dates)
-                attendance_pct = (n_sessions_played / total_club_sessions * 100) if total_club_sessions > 0 else 0
-                roi = (total_profit / total_buyin * 100) if total_buyin > 0 else 0
-                max_win = df_active["Profitto"].max() if not df_active.empty else 0
-                max_loss = df_active["Profitto"].min() if not df_active.empty else 0
-                wins_df = df_active[df_active["Profitto"] > 0]
-                losses_df = df_active[df_active["Profitto"] < 0]
-                avg_win = wins_df["Profitto"].mean() if not wins_df.empty else 0
-                avg_loss = losses_df["Profitto"].mean() if not losses_df.empty else 0
-                n_wins = len(wins_df)
-                win_rate = (n_wins / n_sessions_played * 100) if n_sessions_played > 0 else 0
-                std_dev = df_active["Profitto"].std()
-                if pd.isna(std_dev): std_dev = 0
-                
-                # Streak Calc
-                max_win_streak_count = 0; max_win_streak_money = 0; best_money_streak_val = 0; best_money_streak_count = 0
-                max_loss_streak_count = 0; max_loss_streak_money = 0; worst_money_streak_val = 0; worst_money_streak_count = 0
-                current_streak_type = 0; current_count = 0; current_sum = 0
-                profits_loop = df_active["Profitto"].tolist() + [0] 
-                for val in profits_loop:
-                    tipo_attuale = 1 if val > 0 else (-1 if val < 0 else 0)
-                    if tipo_attuale == 0: 
-                        if current_streak_type == 1:
-                            if current_count > max_win_streak_count: max_win_streak_count = current_count; max_win_streak_money = current_sum
-                            if current_sum > best_money_streak_val: best_money_streak_val = current_sum; best_money_streak_count = current_count
-                        elif current_streak_type == -1:
-                            if current_count > max_loss_streak_count: max_loss_streak_count = current_count; max_loss_streak_money = current_sum
-                            if current_sum < worst_money_streak_val: worst_money_streak_val = current_sum; worst_money_streak_count = current_count
-                        current_streak_type = 0; current_count = 0; current_sum = 0
-                        continue
-                    if tipo_attuale == current_streak_type:
-                        current_count += 1; current_sum += val
-                    else:
-                        if current_streak_type == 1: 
-                            if current_count > max_win_streak_count: max_win_streak_count = current_count; max_win_streak_money = current_sum
-                            if current_sum > best_money_streak_val: best_money_streak_val = current_sum; best_money_streak_count = current_count
-                        elif current_streak_type == -1: 
-                            if current_count > max_loss_streak_count: max_loss_streak_count = current_count; max_loss_streak_money = current_sum
-                            if current_sum < worst_money_streak_val: worst_money_streak_val = current_sum; worst_money_streak_count = current_count
-                        current_streak_type = tipo_attuale; current_count = 1; current_sum = val
-                
-                curr_streak = 0
-                for p in df_active["Profitto"].iloc[::-1]:
-                    if p > 0:
-                        if curr_streak >= 0: curr_streak += 1
-                        else: break
-                    elif p < 0:
-                        if curr_streak <= 0: curr_streak -= 1
-                        else: break
-                    else: break
+                r = {c: riepilogo.at[selected_player, c] for c in riepilogo.columns}
+                total_profit = r["Bilancio"]
+                n_sessions_played = r["Sessioni"]; total_club_sessions = r["SessioniClub"]; attendance_pct = r["Presenze"]
+                roi = r["ROI"]; max_win = r["MaxVincita"]; max_loss = r["MaxPerdita"]
+                avg_win = r["MediaVincita"]; avg_loss = r["MediaPerdita"]
+                n_wins = r["Vittorie"]; n_losses = r["Sconfitte"]; win_rate = r["WinRate"]; std_dev = r["Volatilita"]
+                max_win_streak_count = r["MaxSerieVinte"]; max_win_streak_money = r["SoldiMaxSerieVinte"]
+                best_money_streak_val = r["MigliorSerieSoldi"]; best_money_streak_count = r["SessMigliorSerieSoldi"]
+                max_loss_streak_count = r["MaxSeriePerse"]; max_loss_streak_money = r["SoldiMaxSeriePerse"]
+                worst_money_streak_val = r["PeggiorSerieSoldi"]; worst_money_streak_count = r["SessPeggiorSerieSoldi"]
+                curr_streak = r["StreakAttuale"]
                 
                 streak_icon = "🔥" if curr_streak > 0 else ("❄️" if curr_streak < 0 else "😐")
                 
@@ -436,7 +452,7 @@ def mostra_statistiche(club_name, is_host):
                 k1.metric("Bilancio", f"€ {total_profit:.2f}", f"{streak_icon} {curr_streak} Streak")
                 k2.metric("ROI %", f"{roi:.1f}%")
                 k3.metric("Presenze", f"{attendance_pct:.0f}%", f"{n_sessions_played} su {total_club_sessions}")
-                k4.metric("Win Rate", f"{win_rate:.0f}%", f"{n_wins}V - {len(losses_df)}P")
+                k4.metric("Win Rate", f"{win_rate:.0f}%", f"{n_wins}V - {n_losses}P")
                 
                 st.write("")
                 d1, d2, d3, d4 = st.columns(4)
@@ -460,12 +476,13 @@ def mostra_statistiche(club_name, is_host):
                 st.markdown("---")
                 
                 st.subheader("📊 Sessioni")
-                df_active_plot = df_active.copy()
-                df_active_plot["Colore"] = df_active_plot["Profitto"].apply(lambda x: "Vinta" if x >= 0 else "Persa")
-                fig_bar = px.bar(df_active_plot, x="Data", y="Profitto", color="Colore", color_discrete_map={"Vinta": "#00CC96", "Persa": "#EF553B"}, text="Profitto")
-                fig_bar.update_traces(texttemplate='%{text:.0f}€', textposition='outside')
-                fig_bar.add_hline(y=0, line_dash="dash", line_color="white")
-                fig_bar.update_layout(showlegend=False, xaxis_title=None, yaxis_title="€")
+                with metriche.fase("grafico:sessioni"):
+                    df_active_plot = df_active.copy()
+                    df_active_plot["Colore"] = df_active_plot["Profitto"].apply(lambda x: "Vinta" if x >= 0 else "Persa")
+                    fig_bar = px.bar(df_active_plot, x="Data", y="Profitto", color="Colore", color_discrete_map={"Vinta": "#00CC96", "Persa": "#EF553B"}, text="Profitto")
+                    fig_bar.update_traces(texttemplate='%{text:.0f}€', textposition='outside')
+                    fig_bar.add_hline(y=0, line_dash="dash", line_color="white")
+                    fig_bar.update_layout(showlegend=False, xaxis_title=None, yaxis_title="€")
                 st.plotly_chart(fig_bar, use_container_width=True)
                 
                 st.subheader("📈 Bankroll Dinamico")
@@ -473,55 +490,66 @@ def mostra_statistiche(club_name, is_host):
                 start_date = df_p["Data"].min() - pd.Timedelta(days=1)
                 row_zero = pd.DataFrame({"Data": [start_date], "CumProfit": [0], "Profitto": [0]})
                 df_chart = pd.concat([row_zero, df_p]).sort_values("Data").reset_index(drop=True)
-                df_chart["pos_fill"] = df_chart["CumProfit"].apply(lambda x: x if x > 0 else 0)
-                df_chart["neg_fill"] = df_chart["CumProfit"].apply(lambda x: x if x < 0 else 0)
-                
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(x=df_chart["Data"], y=df_chart["pos_fill"], fill='tozeroy', fillcolor="rgba(0, 204, 150, 0.2)", mode='none', hoverinfo='skip', showlegend=False))
-                fig.add_trace(go.Scatter(x=df_chart["Data"], y=df_chart["neg_fill"], fill='tozeroy', fillcolor="rgba(239, 85, 59, 0.2)", mode='none', hoverinfo='skip', showlegend=False))
-                green_x, green_y = [], []; red_x, red_y = [], []; blue_x, blue_y = [], []
-                for i in range(1, len(df_chart)):
-                    x0, y0 = df_chart["Data"].iloc[i-1], df_chart["CumProfit"].iloc[i-1]
-                    x1, y1 = df_chart["Data"].iloc[i], df_chart["CumProfit"].iloc[i]
-                    diff = df_chart["Profitto"].iloc[i] 
-                    if diff > 0: green_x.extend([x0, x1, None]); green_y.extend([y0, y1, None])
-                    elif diff < 0: red_x.extend([x0, x1, None]); red_y.extend([y0, y1, None])
-                    else: blue_x.extend([x0, x1, None]); blue_y.extend([y0, y1, None])
-                width_line = 3
-                fig.add_trace(go.Scatter(x=green_x, y=green_y, mode='lines+markers', line=dict(color="#00CC96", width=width_line), marker=dict(size=4), name="Vittoria"))
-                fig.add_trace(go.Scatter(x=red_x, y=red_y, mode='lines+markers', line=dict(color="#EF553B", width=width_line), marker=dict(size=4), name="Sconfitta"))
-                fig.add_trace(go.Scatter(x=blue_x, y=blue_y, mode='lines+markers', line=dict(color="#636EFA", width=width_line, dash='dot'), marker=dict(size=4), name="Assente/Pari"))
-                fig.update_layout(xaxis_title=None, yaxis_title="€ Totali", showlegend=False, hovermode="x unified")
+                fig = grafici.figura_bankroll(df_chart["Data"], df_chart["CumProfit"])
                 st.plotly_chart(fig, use_container_width=True)
 
+                st.subheader("🏃 Forma")
+                f1, f2, f3 = st.columns(3)
+                tipo_finestra = f1.radio("Finestra", ["Ultime sessioni", "Ultimi giorni"], horizontal=True)
+                per_sessioni = tipo_finestra == "Ultime sessioni"
+                ampiezza = f2.number_input("Ampiezza", min_value=2, value=10 if per_sessioni else 90, step=1, key=f"forma_{tipo_finestra}")
+                metriche_forma = {"Profitto": "Profitto (€)", "ROI": "ROI %", "WinRate": "Win Rate %", "Volatilita": "Volatilità (€)"}
+                metrica_forma = f3.selectbox("Metrica", list(metriche_forma), format_func=metriche_forma.get)
+                progressivi = cubo_club(club_name)["progressivi"].get(selected_player)
+                if progressivi is None:
+                    st.info("Nessuna sessione giocata.")
+                else:
+                    with metriche.fase("statistiche:forma"):
+                        df_forma = statistiche.forma(progressivi, sessioni=int(ampiezza)) if per_sessioni else statistiche.forma(progressivi, giorni=int(ampiezza))
+                    attuale = df_forma.iloc[-1]
+                    m1, m2, m3, m4 = st.columns(4)
+                    m1.metric("Profitto", f"€ {attuale['Profitto']:.0f}", f"{attuale['Sessioni']} sess.", delta_color="off")
+                    m2.metric("ROI", f"{attuale['ROI']:.1f}%")
+                    m3.metric("Win Rate", f"{attuale['WinRate']:.0f}%")
+                    m4.metric("Volatilità", f"€ {attuale['Volatilita']:.1f}")
+                    st.plotly_chart(grafici.figura_forma(df_forma, metrica_forma, metriche_forma[metrica_forma]), use_container_width=True)
+                    st.caption(f"Forma attuale sulle {'ultime ' + str(int(ampiezza)) + ' sessioni' if per_sessioni else 'sessioni degli ultimi ' + str(int(ampiezza)) + ' giorni'}, su tutto lo storico del club.")
+
+                st.subheader("🎲 Proiezione (Monte Carlo)")
+                p1, p2, p3 = st.columns(3)
+                n_futuro = p1.number_input("Prossime sessioni", min_value=1, max_value=500, value=simulazione.SESSIONI_FUTURE, step=10)
+                soglia_dd = p2.number_input("Drawdown (€)", min_value=1, value=100, step=25)
+                bankroll = p3.number_input("Bankroll (€)", min_value=1, value=200, step=50)
+                sim = proiezione(tuple(df_active["Profitto"]), int(n_futuro))
+                if sim is None:
+                    st.info(f"Servono almeno {simulazione.MIN_SESSIONI} sessioni giocate per la proiezione.")
+                else:
+                    s1, s2, s3, s4 = st.columns(4)
+                    s1.metric("Profitto Atteso", f"€ {sim['atteso']:.0f}", f"{sim['positivo']:.0f}% in attivo")
+                    s2.metric("Forbice 90%", f"€ {sim['bande']['P5'].iat[-1]:.0f} / {sim['bande']['P95'].iat[-1]:.0f}")
+                    s3.metric(f"Drawdown ≥ € {soglia_dd}", f"{simulazione.probabilita_drawdown(sim, soglia_dd):.1f}%")
+                    s4.metric("Rischio Rovina", f"{simulazione.rischio_rovina(sim, bankroll):.1f}%")
+                    st.plotly_chart(grafici.figura_proiezione(sim["bande"]), use_container_width=True)
+                    st.caption(f"{sim['percorsi']} percorsi ricampionati dalle tue {sim['campione']} sessioni del periodo.")
+
     with tab_club:
         st.caption(f"Analisi periodo: **{filtro_anno}**")
-        num_sessions = len(df_filtered["Data"].unique())
-        total_buyin_all = df_filtered["BuyIn"].sum()
-        
-        player_profits = df_filtered.groupby("Giocatore")["Profitto"].sum()
-        if not player_profits.empty:
-            shark_name = player_profits.idxmax(); shark_val = player_profits.max()
-        else:
-            shark_name = "-"; shark_val = 0
+        salute = snap["salute"]
+        num_sessions = salute["Sessioni"]; total_buyin_all = salute["Volume"]
+        shark_name, shark_val = salute["Shark"]
+        sniper_name, sniper_val = salute["Sniper"]
             
-        if not df_filtered.empty:
-            sniper_idx = df_filtered["Profitto"].idxmax(); sniper_name = df_filtered.loc[sniper_idx, "Giocatore"]; sniper_val = df_filtered.loc[sniper_idx, "Profitto"]
-        else:
-            sniper_name = "-"; sniper_val = 0
-            
-        all_players = sorted(df_filtered["Giocatore"].unique())
+        all_players = sorted(snap["presenze"].index)
         with st.expander("⚙️ Opzioni calcolo presenze (Escludi Host)"):
             excluded_players = st.multiselect("Escludi giocatori dal premio 'Stakanovista'", all_players, default=[])
-        attendance_counts = df_filtered.groupby("Giocatore")["Data"].nunique()
-        attendance_counts_clean = attendance_counts.drop(excluded_players, errors='ignore')
+        attendance_counts_clean = snap["presenze"].drop(excluded_players, errors='ignore')
         if not attendance_counts_clean.empty:
             stak_name = attendance_counts_clean.idxmax(); stak_val = attendance_counts_clean.max()
         else:
             stak_name = "N/A"; stak_val = 0
         
-        avg_money_per_session = total_buyin_all / num_sessions if num_sessions > 0 else 0
-        avg_players_per_session = len(df_filtered) / num_sessions if num_sessions > 0 else 0
+        avg_money_per_session = salute["PotMedio"]
+        avg_players_per_session = salute["PartecipantiMedi"]
         
         st.subheader("🏆 Hall of Fame")
         k1, k2, k3 = st.columns(3)
@@ -538,53 +566,83 @@ def mostra_statistiche(club_name, is_host):
         st.markdown("---")
         
         st.subheader("⚔️ Il Trono (Storia del Record)")
-        df_pivot = df_filtered.pivot_table(index="Data", columns="Giocatore", values="Profitto", aggfunc="sum").fillna(0)
-        df_cumsum = df_pivot.cumsum()
-        if not df_cumsum.empty:
-            leader_series = df_cumsum.idxmax(axis=1); max_val_series = df_cumsum.max(axis=1)   
-            df_race = pd.DataFrame({"Leader": leader_series, "Profitto": max_val_series}).reset_index().sort_values("Data")
-            start_date_all = df_race["Data"].min() - pd.Timedelta(days=1)
-            first_leader = df_race.iloc[0]["Leader"] if not df_race.empty else "N/A"
-            row_zero = pd.DataFrame({"Data": [start_date_all], "Leader": [first_leader], "Profitto": [0]})
-            df_race = pd.concat([row_zero, df_race]).sort_values("Data")
-            fig_race = go.Figure()
-            unique_leaders = df_race["Leader"].unique(); colors = px.colors.qualitative.Plotly 
-            color_map = {player: colors[i % len(colors)] for i, player in enumerate(unique_leaders)}
-            for i in range(1, len(df_race)):
-                x0, y0 = df_race["Data"].iloc[i-1], df_race["Profitto"].iloc[i-1]; x1, y1 = df_race["Data"].iloc[i], df_race["Profitto"].iloc[i]; current_leader = df_race["Leader"].iloc[i] 
-                fig_race.add_trace(go.Scatter(x=[x0, x1], y=[y0, y1], mode='lines+markers', line=dict(color=color_map.get(current_leader, 'grey'), width=4), marker=dict(size=8, color=color_map.get(current_leader, 'grey')), name=current_leader, legendgroup=current_leader, showlegend=False, hovertemplate=f"<b>{current_leader}</b><br>Record: €%{{y:.0f}}<extra></extra>"))
-            for leader in unique_leaders: fig_race.add_trace(go.Scatter(x=[None], y=[None], mode='markers', marker=dict(size=10, color=color_map.get(leader, 'grey')), name=leader, legendgroup=leader, showlegend=True))
-            fig_race.update_layout(xaxis_title=None, yaxis_title="Profitto Record (€)", hovermode="closest"); st.plotly_chart(fig_race, use_container_width=True)
+        df_race = snap["trono"]
+        if not df_race.empty:
+            st.plotly_chart(grafici.figura_trono(df_race), use_container_width=True)
         else: st.info("Dati insufficienti per il grafico del Trono.")
         
         st.subheader("💓 Il Polso del Club")
-        daily_stats = df_filtered.groupby("Data").agg(Players=("Giocatore", "count"), Pot=("BuyIn", "sum")).sort_index()
-        fig_combo = make_subplots(specs=[[{"secondary_y": True}]])
-        fig_combo.add_trace(go.Bar(x=daily_stats.index, y=daily_stats["Players"], name="N° Giocatori", marker_color="#636EFA", opacity=0.5), secondary_y=False)
-        fig_combo.add_trace(go.Scatter(x=daily_stats.index, y=daily_stats["Pot"], name="Pot (€)", mode='lines+markers', line=dict(color="#00CC96", width=3)), secondary_y=True)
-        fig_combo.update_layout(hovermode="x unified", showlegend=False)
-        fig_combo.update_yaxes(title_text="N° Giocatori", secondary_y=False, showgrid=False)
-        fig_combo.update_yaxes(title_text="Pot (€)", secondary_y=True, showgrid=True)
-        st.plotly_chart(fig_combo, use_container_width=True)
+        daily_stats = snap["polso"]
+        st.plotly_chart(grafici.figura_polso(daily_stats), use_container_width=True)
         
         st.markdown("---")
         st.subheader("📋 Classifica Dettagliata")
-        stats = df_filtered.groupby("Giocatore").agg({"Data": "nunique", "BuyIn": "sum", "Profitto": "sum"})
-        stats = stats.rename(columns={"Data": "Sessioni", "BuyIn": "Volume (€)"})
-        stats["ROI %"] = (stats["Profitto"] / stats["Volume (€)"] * 100).round(1).fillna(0.0)
-        view_stats = stats[["Sessioni", "Volume (€)", "Profitto", "ROI %"]].sort_values("Profitto", ascending=False)
+        view_stats = snap["classifica"]
         st.dataframe(view_stats.style.format({"Profitto": "€ {:.2f}", "Volume (€)": "€ {:.0f}", "ROI %": "{:.1f}%"}).background_gradient(subset=["Profitto"], cmap="RdYlGn", vmin=-50, vmax=50), use_container_width=True)
 
+        if is_host:
+            st.markdown("---")
+            st.subheader("🤝 Testa a Testa")
+            matrici = testa_a_testa_club(club_name, anno_sel, mese_sel)
+            if matrici is None: st.info("Dati insufficienti.")
+            else:
+                viste = {"Differenza": ("Δ € a sessione con l'avversario", True), "MediaCon": ("€ medi a sessione con l'avversario", True), "Insieme": ("Sessioni insieme", False), "Affinita": ("Affinità presenze %", False)}
+                h1, h2, h3 = st.columns(3)
+                vista = h1.selectbox("Matrice", list(viste), format_func=lambda v: viste[v][0])
+                n_gioc = len(matrici["Sessioni"])
+                quanti = h2.number_input("Giocatori più presenti", min_value=2, max_value=n_gioc, value=min(25, n_gioc), step=5) if n_gioc > 2 else n_gioc
+                minimo = h3.number_input("Min. sessioni insieme", min_value=1, value=3, step=1)
+                # I più presenti, e celle con troppe poche sessioni insieme nascoste
+                scelti = matrici["Sessioni"].nlargest(int(quanti)).index
+                matrice = matrici[vista].loc[scelti, scelti]
+                if vista in ("Differenza", "MediaCon"): matrice = matrice.where(matrici["Insieme"].loc[scelti, scelti] >= minimo)
+                titolo, divergente = viste[vista]
+                st.plotly_chart(grafici.figura_matrice(matrice, titolo, divergente), use_container_width=True)
+                giocatore_h2h = st.selectbox("Dettaglio giocatore", list(matrici["Sessioni"].index), key="h2h_giocatore")
+                dettaglio = pd.DataFrame({k: matrici[k].loc[giocatore_h2h] for k in ["Insieme", "MediaCon", "MediaSenza", "Differenza", "Affinita"]}).drop(giocatore_h2h)
+                dettaglio = dettaglio[dettaglio["Insieme"] >= minimo].sort_values("Differenza", ascending=False)
+                st.dataframe(dettaglio.rename(columns={"Insieme": "Sessioni Insieme", "MediaCon": "€/Sess. Con", "MediaSenza": "€/Sess. Senza", "Differenza": "Δ €/Sess.", "Affinita": "Affinità %"})
+                             .style.format("{:.1f}").format({"Sessioni Insieme": "{:.0f}"}), use_container_width=True)
+
+            st.markdown("---")
+            st.subheader("🎲 Rischio del Club (Monte Carlo)")
+            r1, r2, r3 = st.columns(3)
+            n_club = r1.number_input("Prossime sessioni", min_value=1, max_value=500, value=simulazione.SESSIONI_FUTURE, step=10, key="mc_club_n")
+            soglia_club = r2.number_input("Drawdown (€)", min_value=1, value=100, step=25, key="mc_club_dd")
+            bankroll_club = r3.number_input("Bankroll (€)", min_value=1, value=200, step=50, key="mc_club_br")
+            if st.button("Simula tutti i giocatori"): st.session_state.mc_club = True
+            if st.session_state.get("mc_club"):
+                rischio = rischio_club(club_name, anno_sel, mese_sel, int(n_club), soglia_club, bankroll_club)
+                rischio.index = rischio.index.astype(str)
+                st.dataframe(rischio.rename(columns={"Campione": "Sessioni", "Atteso": "Atteso (€)", "P5": "P5 (€)", "P95": "P95 (€)", "InAttivo": "In Attivo %", "DrawdownMediano": "Drawdown Mediano (€)", "ProbDrawdown": f"Drawdown ≥ €{soglia_club} %", "Rovina": "Rovina %"})
+                             .style.format("{:.1f}"), use_container_width=True)
+
 def gestisci_storico(club_name, is_host):
     st.header("📜 Storico (Cloud)")
-    df = carica_dati_club(club_name)
-    if not df.empty:
-        # Pulizia e ordinamento
-        df["Data"] = pd.to_datetime(df["Data"], errors='coerce')
-        df = df.sort_values("Data", ascending=False)
-        st.dataframe(df.style.format({"BuyIn": "€ {:.2f}", "CashOut": "€ {:.2f}", "Profitto": "€ {:.2f}"}))
-    else:
+    cubo = cubo_club(club_name)
+    df = cubo["partite"]
+    if df.empty:
         st.info("Nessuno storico.")
+        return
+    # Filtri e paginazione lato server: si converte e si disegna solo la pagina visibile
+    c1, c2, c3 = st.columns(3)
+    with c1: scelti = st.multiselect("Giocatori", list(df["Giocatore"].cat.categories))
+    prima, ultima = (pd.Timestamp(d).date() for d in cubo["storico"][1][[0, -1]])
+    with c2: periodo = st.date_input("Dal / Al", (), min_value=prima, max_value=ultima)
+    with c3: testo = st.text_input("🔎 Cerca giocatore")
+    dal, al = (tuple(periodo) + (None, None))[:2] if isinstance(periodo, (tuple, list)) else (periodo, periodo)
+    righe = statistiche.filtra_storico(df, cubo["storico"], scelti, dal, al, testo)
+    if len(righe) == 0:
+        st.warning("Nessuna partita corrisponde ai filtri.")
+        return
+    per_pagina = statistiche.RIGHE_PER_PAGINA
+    pagine = -(-len(righe) // per_pagina)
+    filtri = hashlib.sha1(repr((scelti, dal, al, testo)).encode()).hexdigest()[:8]
+    pagina = st.number_input(f"Pagina (di {pagine})", min_value=1, max_value=pagine, value=1, key=f"pagina_storico_{filtri}")
+    inizio = (pagina - 1) * per_pagina
+    vista = statistiche.in_euro(df.iloc[righe[inizio:inizio + per_pagina]])
+    st.caption(f"Righe {inizio + 1}–{inizio + len(vista)} di {len(righe)}")
+    st.dataframe(vista.style.format({"BuyIn": "€ {:.2f}", "CashOut": "€ {:.2f}", "Profitto": "€ {:.2f}"}), hide_index=True)
 
 def dashboard_club(club_name):
     owner = get_club_owner(club_name)
@@ -592,20 +650,78 @@ def dashboard_club(club_name):
     st.title(f"🏠 {club_name}")
     opzioni = ["Partita in Corso", "Statistiche", "Storico", "Membri"]
     if is_host: opzioni.append("Importa Dati")
-    menu = st.radio("Menu", opzioni, horizontal=True)
+    menu = st.radio("Menu", opzioni, horizontal=True, key="menu")
+    with metriche.fase(f"pagina:{menu}"):
+        mostra_pagina(club_name, menu, is_host)
+    if is_host: pannello_prestazioni()
+
+def mostra_pagina(club_name, menu, is_host):
     if menu == "Partita in Corso": gestisci_partita_live(club_name, is_host)
     elif menu == "Statistiche": mostra_statistiche(club_name, is_host)
     elif menu == "Storico": gestisci_storico(club_name, is_host)
     elif menu == "Membri":
-        clubs = carica_clubs()
-        st.table(pd.DataFrame(clubs[club_name]["members"], columns=["Membri"]))
+        st.table(pd.DataFrame(get_club_members(club_name), columns=["Membri"]))
         if is_host:
-            u = st.text_input("Username invito")
-            if st.button("Invita") and u: aggiungi_membro_al_club(club_name, u)
+            u = st.text_input("Username invito (più nomi separati da virgola)")
+            invitati = [x.strip() for x in u.split(",") if x.strip()]
+            if st.button("Invita") and invitati:
+                esito = aggiungi_membri_al_club(club_name, invitati)
+                messaggi = {"success": "invitato", "already_in": "già membro", "not_found": "utente inesistente", "error": "errore"}
+                for nome, e in esito.items():
+                    (st.success if e == "success" else st.warning)(f"{nome}: {messaggi[e]}")
     elif menu == "Importa Dati":
         if is_host: importa_dati(club_name)
         else: st.error("Accesso Negato")
 
+def pannello_prestazioni():
+    # Solo per l'host: dove è andato il tempo in questo rerun
+    misure = metriche.corrente()
+    with st.sidebar.expander("⏱️ Prestazioni"):
+        api = pd.DataFrame([{"Richiesta": k, "Chiamate": c, "KiB": (i + r) / 1024, "Secondi": t} for k, (c, i, r, t) in misure.api.items()], columns=["Richiesta", "Chiamate", "KiB", "Secondi"])
+        cache = pd.DataFrame([{"Loader": k, "Hit": h, "Miss": m} for k, (h, m) in misure.cache.items()], columns=["Loader", "Hit", "Miss"])
+        fasi = pd.DataFrame([{"Fase": k, "Secondi": t, "Volte": n} for k, (t, n) in misure.fasi.items()], columns=["Fase", "Secondi", "Volte"])
+        hit, totale = cache["Hit"].sum(), cache["Hit"].sum() + cache["Miss"].sum()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Rerun", f"{misure.durata() * 1000:.0f} ms")
+        c2.metric("Sheets", f"{api['Chiamate'].sum()}", f"{api['KiB'].sum():.0f} KiB", delta_color="off")
+        c3.metric("Cache", f"{hit / totale * 100:.0f}%" if totale else "-", f"{hit}/{totale} hit", delta_color="off")
+        st.caption("Fasi (tempi inclusivi)")
+        st.dataframe(fasi.sort_values("Secondi", ascending=False).style.format({"Secondi": "{:.3f}"}), hide_index=True)
+        if not api.empty: st.dataframe(api.style.format({"KiB": "{:.1f}", "Secondi": "{:.3f}"}), hide_index=True)
+        if not cache.empty: st.dataframe(cache, hide_index=True)
+        fondo = sum(c for c, *_ in metriche.PROCESSO.api.values())
+        st.caption(f"Richieste Sheets in background dall'avvio del processo: {fondo}")
+
+def mostra_classifica_globale(username):
+    st.divider(); st.header("🌍 Classifica Globale")
+    totale, per_club, esclusi = classifica_globale(username)
+    if esclusi: st.caption(f"Non ancora inclusi (apri il club per caricarli): {', '.join(esclusi)}")
+    if totale.empty: st.info("Nessuna partita registrata."); return
+    colonne = {"Club": "Club", "Sessioni": "Sessioni", "Bilancio": "Bilancio", "Volume": "Volume", "ROI": "ROI %", "WinRate": "Win Rate %", "StreakAttuale": "Streak", "MaxSerieVinte": "Max Serie V", "MaxSeriePerse": "Max Serie P"}
+    fmt = {"Bilancio": "€ {:.2f}", "Volume": "€ {:.0f}", "ROI %": "{:.1f}%", "Win Rate %": "{:.1f}%"}
+    classifica = totale[list(colonne)].rename(columns=colonne)
+    classifica.index = classifica.index.astype(str)
+    st.dataframe(classifica.style.format(fmt).background_gradient(subset=["Bilancio"], cmap="RdYlGn", vmin=-100, vmax=100), use_container_width=True)
+
+    # Come in mostra_statistiche: il proprio profilo, più i giocatori dei club che si gestiscono
+    # e, per loro, solo il dettaglio di quei club
+    st.subheader("👤 Profilo Giocatore")
+    gestiti = [c for c in get_user_clubs(username) if get_club_owner(c) == username]
+    nei_gestiti = per_club[per_club.index.get_level_values("Club").astype(str).isin(gestiti)]
+    giocatori = [username] if username in classifica.index else []
+    giocatori += sorted(set(nei_gestiti.index.get_level_values("Giocatore").astype(str)) - set(giocatori))
+    if not giocatori: st.info("Non hai ancora giocato sessioni."); return
+    scelto = st.selectbox("Giocatore", giocatori, key="profilo_globale")
+    dettaglio = (per_club if scelto == username else nei_gestiti)
+    dettaglio = dettaglio[dettaglio.index.get_level_values("Giocatore") == scelto].droplevel("Giocatore")
+    riga = classifica.loc[scelto]
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Bilancio Totale", f"€ {riga['Bilancio']:.2f}"); c2.metric("ROI", f"{riga['ROI %']:.1f}%")
+    c3.metric("Sessioni", int(riga["Sessioni"])); c4.metric("Streak Attuale", int(riga["Streak"]))
+    dettaglio = dettaglio[[c for c in colonne if c != "Club"] + ["Presenze"]].rename(columns={**colonne, "Presenze": "Presenze %"})
+    dettaglio.index = dettaglio.index.astype(str)
+    st.dataframe(dettaglio.style.format({**fmt, "Presenze %": "{:.1f}%"}), use_container_width=True)
+
 def main_app():
     st.sidebar.write(f"Utente: **{st.session_state.username}**")
     if st.sidebar.button("Logout"): st.session_state.logged_in = False; st.rerun()
@@ -617,9 +733,13 @@ def main_app():
         with st.expander("Crea Nuovo Club"):
             n = st.text_input("Nome Club")
             if st.button("Crea") and n: crea_club(n, st.session_state.username); st.rerun()
+        mostra_classifica_globale(st.session_state.username)
     else:
         if st.sidebar.button("🔙 Indietro"): st.session_state.current_club = None; st.rerun()
         dashboard_club(st.session_state.current_club)
 
-if st.session_state.logged_in: main_app()
-else: login_page()
\ No newline at end of file
+try:
+    if st.session_state.logged_in: main_app()
+    else: login_page()
+finally:
+    metriche.chiudi(misure, utente=st.session_state.username, club=st.session_state.current_club, pagina=st.session_state.get("menu"))
\ No newline at end of file
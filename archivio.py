@@ -0,0 +1,552 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread
+import pandas as pd
+import pyarrow as pa
+from gspread.utils import absolute_range_name, rowcol_to_a1
+from pyarrow import feather
+
+# --- LAYOUT PARTIZIONATO ---
+# Ogni club ha il suo foglio "Partite · <club>": caricare un club legge solo le sue righe.
+# Il vecchio foglio condiviso "Partite" resta come archivio storico e viene letto
+# una sola volta per club, quando la sua partizione viene creata (migrazione).
+
+FOGLIO_LEGACY = "Partite"
+HEADER_PARTITE = ["Data", "Giocatore", "BuyIn", "CashOut", "Profitto", "Club"]
+TESTUALI_PARTITE = ("Data", "Giocatore", "Club")  # mai convertite in numeri: un giocatore "123" resta "123"
+PREFISSO_PARTIZIONE = "Partite · "
+MAX_TITOLO = 100  # limite di Google Sheets sul nome di un foglio
+_CARATTERI_VIETATI = re.compile(r"[\[\]\*\?/\\:]")
+
+def nome_partizione(club_name):
+    club_name = str(club_name)
+    pulito = _CARATTERI_VIETATI.sub("_", club_name).strip()
+    titolo = PREFISSO_PARTIZIONE + pulito
+    if pulito != club_name or len(titolo) > MAX_TITOLO:
+        # Nome ritoccato: il suffisso hash evita che due club finiscano nello stesso foglio
+        suffisso = " #" + hashlib.sha1(club_name.encode()).hexdigest()[:6]
+        titolo = titolo[:MAX_TITOLO - len(suffisso)] + suffisso
+    return titolo
+
+# --- SYNC INCREMENTALE ---
+# I fogli vengono scritti solo in append: lo specchio ricorda quante righe ha già visto
+# e a ogni aggiornamento scarica solo quelle nuove, rileggendo insieme l'ultima riga nota.
+# Se quella riga non coincide più (modificata o cancellata) si ricarica tutto il foglio.
+# Le modifiche a righe più vecchie vengono riprese dalla ricarica completa periodica
+# o da invalida(), che chi modifica righe esistenti deve chiamare.
+# I valori grezzi (stringhe, come arrivano da Sheets) restano in "grezzi"; "df" è la
+# versione numerica, come quella di get_all_records.
+
+RICARICA_COMPLETA_OGNI = 600  # secondi
+SALVA_SNAPSHOT_OGNI = 30      # secondi tra due salvataggi dello snapshot dopo un delta
+
+def _numericizza(grezzi, header, testuali=()):
+    # Versione vettoriale di gspread.utils.numericise_all, colonna per colonna: i numeri
+    # interi restano int anche nelle colonne miste. Le colonne in "testuali" restano stringhe
+    colonne = []
+    for i in range(grezzi.shape[1]):
+        testo = grezzi.iloc[:, i]
+        if header[i] in testuali:
+            colonne.append(testo)
+            continue
+        pulito = testo.str.replace(",", "", regex=False).where(~testo.str.contains("_", regex=False))
+        num = pd.to_numeric(pulito, errors="coerce")
+        if len(num) and num.notna().all(): colonne.append(num)
+        elif num.isna().all(): colonne.append(testo)
+        else:
+            valori = num.astype(object)
+            interi = pulito.str.fullmatch(r"\s*[+-]?\d+\s*", na=False)
+            if interi.any(): valori[interi] = pd.to_numeric(pulito[interi]).astype(object)
+            colonne.append(testo.astype(object).where(num.isna(), valori))
+    df = pd.concat(colonne, axis=1) if colonne else pd.DataFrame(index=grezzi.index)
+    df.columns = header
+    return df
+
+class SpecchioFoglio:
+    def __init__(self, apri_ws, ricarica_ogni=RICARICA_COMPLETA_OGNI, snapshot=None, nome=None, testuali=()):
+        # apri_ws: funzione che apre il foglio, chiamata solo alla prima sincronizzazione.
+        # testuali: colonne lasciate come stringhe in "df"
+        self._apri_ws = apri_ws
+        self.testuali = testuali
+        self._ws = None
+        self.ricarica_ogni = ricarica_ogni
+        self.snapshot = snapshot
+        self.nome = nome
+        self.header = []
+        self.grezzi = pd.DataFrame()
+        self.df = pd.DataFrame()
+        self.generazione = 0  # cambia a ogni ricarica completa
+        self._ultima_completa = None
+        self._ultimo_salvataggio = 0.0
+        self._precaricato = False
+        self._lock = threading.Lock()
+        if snapshot is not None: self._carica_snapshot()
+
+    @property
+    def ws(self):
+        if self._ws is None: self._ws = self._apri_ws()
+        return self._ws
+
+    def invalida(self):
+        with self._lock:
+            self._ultima_completa = None
+            self._precaricato = False
+
+    def _scaduto(self):
+        return self._ultima_completa is None or time.monotonic() - self._ultima_completa > self.ricarica_ogni
+
+    def aggiorna(self):
+        with self._lock:
+            if self._precaricato:
+                # Appena letto dall'avvio a lotti: il primo lettore non torna su Sheets
+                self._precaricato = False
+            elif self._scaduto() or not self.header or not self._aggiorna_delta():
+                self._ricarica()
+            return self.df
+
+    # Lettura a lotti (Archivio.avvia): l'archivio chiede a ogni specchio l'intervallo
+    # che gli serve, lo legge insieme agli altri e gli restituisce i valori.
+    def richiesta(self):
+        # (intervallo, delta): intervallo None = tutto il foglio
+        with self._lock:
+            if self._scaduto() or not self.header: return None, False
+            return self._intervallo_delta(), True
+
+    def precarica(self):
+        # Come aggiorna, ma anche il primo lettore successivo non torna su Sheets
+        self.aggiorna()
+        with self._lock: self._precaricato = True
+
+    def applica(self, valori, delta):
+        with self._lock:
+            if not delta: self._ricarica(valori)
+            elif not self._aggiorna_delta(valori):
+                self._ultima_completa = None  # ancora diversa: il prossimo aggiorna ricarica tutto
+                return
+            self._precaricato = True
+
+    def stato(self):
+        with self._lock:
+            return self.generazione, self.header, self.grezzi
+
+    def dati(self):
+        with self._lock:
+            return self.generazione, self.df
+
+    def modifica(self, posizione, colonna, valore):
+        # Scrittura già fatta sul foglio da chi chiama: la si riporta nello specchio
+        # (posizione 0 = prima riga dopo l'header) invece di ricaricare tutto
+        with self._lock:
+            if posizione >= len(self.grezzi): return
+            self.grezzi.iat[posizione, colonna] = str(valore)
+            self.df = _numericizza(self.grezzi, self.header, self.testuali)
+            self._salva_snapshot(forza=True)
+
+    def _imposta(self, header, grezzi):
+        self.header = header
+        self.grezzi = grezzi
+        self.df = _numericizza(grezzi, header, self.testuali) if header else pd.DataFrame()
+        self.generazione += 1
+
+    def _carica_snapshot(self):
+        caricato = self.snapshot.carica(self.nome)
+        if caricato is None: return
+        self._imposta(*caricato)
+        # Lo snapshot vale come una ricarica completa: al primo accesso basta il delta
+        self._ultima_completa = time.monotonic()
+
+    def _salva_snapshot(self, forza=False):
+        if self.snapshot is None or not self.header: return
+        if forza or time.monotonic() - self._ultimo_salvataggio > SALVA_SNAPSHOT_OGNI:
+            self.snapshot.salva(self.nome, self.header, self.grezzi)
+            self._ultimo_salvataggio = time.monotonic()
+
+    def _ricarica(self, valori=None):
+        if valori is None: valori = self.ws.get_all_values()
+        header = [str(h) for h in valori[0]] if valori else []
+        self._imposta(header, self._in_grezzi(valori[1:], len(header)))
+        self._ultima_completa = time.monotonic()
+        self._salva_snapshot(forza=True)
+
+    def _intervallo_delta(self):
+        # Dall'ultima riga vista (la riga 1 è l'header) fino in fondo
+        return f"A{len(self.grezzi) + 1}:{rowcol_to_a1(1, len(self.header))[:-1]}"
+
+    def _aggiorna_delta(self, valori=None):
+        if valori is None:
+            try:
+                valori = self.ws.get(self._intervallo_delta())
+            except gspread.exceptions.APIError as e:
+                # 400 = intervallo oltre la fine: il foglio si è accorciato. Quota e errori
+                # del server salgono a chi chiama, senza ripiegare sulla lettura completa
+                if e.code != 400: raise
+                return False
+        atteso = self.grezzi.iloc[-1].tolist() if len(self.grezzi) else self.header
+        if not valori or self._normalizza(valori[0], len(self.header)) != atteso:
+            return False
+        if len(valori) > 1:
+            nuove = self._in_grezzi(valori[1:], len(self.header))
+            nuove.index = pd.RangeIndex(len(self.grezzi), len(self.grezzi) + len(nuove))
+            self.grezzi = pd.concat([self.grezzi, nuove]) if len(self.grezzi) else nuove
+            df_nuove = _numericizza(nuove, self.header, self.testuali)
+            self.df = pd.concat([self.df, df_nuove]) if len(self.df) else df_nuove
+            self._salva_snapshot()
+        return True
+
+    @staticmethod
+    def _normalizza(riga, larghezza):
+        return ([str(v) for v in riga] + [""] * larghezza)[:larghezza]
+
+    def _in_grezzi(self, righe, larghezza):
+        grezzi = pd.DataFrame([self._normalizza(r, larghezza) for r in righe], columns=range(larghezza), dtype="str")
+        return grezzi.reset_index(drop=True)
+
+# --- SNAPSHOT SU DISCO ---
+# Copia colonnare (Feather/Arrow) dei valori grezzi di ogni foglio: all'avvio gli specchi
+# ripartono da qui in pochi millisecondi e chiedono a Sheets solo le righe arrivate dopo.
+# Sheets resta la fonte di verità: lo snapshot viene aggiornato dagli specchi stessi.
+
+CARTELLA_SNAPSHOT = ".snapshot"
+
+class ArchivioSnapshot:
+    def __init__(self, cartella=CARTELLA_SNAPSHOT):
+        self.cartella = cartella
+        os.makedirs(cartella, exist_ok=True)
+
+    def _percorso(self, nome):
+        return os.path.join(self.cartella, hashlib.sha1(nome.encode()).hexdigest()[:16] + ".feather")
+
+    def carica(self, nome):
+        try:
+            tabella = feather.read_table(self._percorso(nome), memory_map=True)
+            header = json.loads(tabella.schema.metadata[b"header"])
+            grezzi = tabella.to_pandas()
+        except (OSError, KeyError, ValueError, pa.ArrowException):
+            return None
+        grezzi.columns = range(len(header))
+        return header, grezzi.astype("str")
+
+    def salva(self, nome, header, grezzi):
+        tabella = pa.table({str(i): pa.array(grezzi.iloc[:, i], type=pa.string()) for i in range(len(header))},
+                           metadata={"header": json.dumps(header), "foglio": nome})
+        tmp = self._percorso(nome) + ".tmp"
+        feather.write_feather(tabella, tmp)
+        os.replace(tmp, self._percorso(nome))
+
+# --- INDICE DUPLICATI ---
+# Per ogni club un contatore delle chiavi (Data, Giocatore, BuyIn, CashOut), tenuto
+# allineato allo specchio del foglio: le righe nuove si aggiungono man mano, una
+# ricarica completa lo ricostruisce. È un multinsieme, così due righe identiche
+# legittime nella stessa sessione restano distinte: la k-esima copia di una riga è
+# un duplicato solo se il foglio ne contiene già almeno k.
+
+def _centesimi(valore):
+    try:
+        return round(float(str(valore).replace("€", "").replace(",", ".").strip() or 0) * 100)
+    except ValueError:
+        return str(valore)
+
+def chiave_partita(data, giocatore, buyin, cashout):
+    return (str(data).strip()[:10], str(giocatore).strip(), _centesimi(buyin), _centesimi(cashout))
+
+def chiave_riga(riga):
+    # riga nel formato HEADER_PARTITE
+    return chiave_partita(*riga[:4])
+
+class IndiceDuplicati:
+    def __init__(self, specchio):
+        self.specchio = specchio
+        self.conteggi = Counter()
+        self._generazione = None
+        self._viste = 0
+        self._lock = threading.Lock()
+
+    def aggiorna(self):
+        self.specchio.aggiorna()
+        generazione, header, grezzi = self.specchio.stato()
+        with self._lock:
+            if generazione != self._generazione:
+                self.conteggi, self._viste, self._generazione = Counter(), 0, generazione
+            if len(grezzi) > self._viste:
+                nuove = grezzi.iloc[self._viste:, [header.index(c) for c in HEADER_PARTITE[:4]]]
+                self.conteggi.update(chiave_partita(*r) for r in zip(*(nuove[c] for c in nuove.columns)))
+            self._viste = len(grezzi)
+            return self.conteggi
+
+class FiltroDuplicati:
+    # Da usare come filtro(riga) -> True se la riga è nuova; uno per scrittura
+    def __init__(self, conteggi):
+        self.conteggi = conteggi
+        self.occorrenze = Counter()
+
+    def __call__(self, riga):
+        chiave = chiave_riga(riga)
+        self.occorrenze[chiave] += 1
+        return self.occorrenze[chiave] > self.conteggi.get(chiave, 0)
+
+# --- INDICE UTENTI ---
+# Username -> hash della password, costruito dallo specchio del foglio Utenti e aggiornato
+# con le sole righe nuove. Login e controllo di unicità sono un lookup nel dizionario:
+# solo se lo username manca si chiede a Sheets il delta, nel caso si sia registrato
+# da un'altra istanza, al massimo ogni SINCRONIZZA_UTENTI_OGNI secondi: una raffica di
+# login con nomi inesistenti non consuma la quota. Le registrazioni fatte qui entrano
+# subito nell'indice.
+
+FOGLIO_UTENTI = "Utenti"
+SINCRONIZZA_UTENTI_OGNI = 5  # secondi
+
+class IndiceUtenti:
+    def __init__(self, specchio, sincronizza_ogni=SINCRONIZZA_UTENTI_OGNI):
+        self.specchio = specchio
+        self.sincronizza_ogni = sincronizza_ogni
+        self.utenti = {}
+        self._generazione = None
+        self._viste = 0
+        self._ultimo = None
+        self._lock = threading.Lock()
+        self._registrazioni = threading.Lock()
+
+    def _sincronizza(self):
+        self.specchio.aggiorna()
+        generazione, header, grezzi = self.specchio.stato()
+        with self._lock:
+            if generazione != self._generazione:
+                self.utenti, self._viste, self._generazione = {}, 0, generazione
+            if len(grezzi) > self._viste and "Username" in header:
+                nuove = grezzi.iloc[self._viste:]
+                self.utenti.update(zip(nuove[header.index("Username")], nuove[header.index("Password")]))
+            self._viste = len(grezzi)
+            self._ultimo = time.monotonic()
+
+    def cerca(self, username, forza=False):
+        # Hash della password, o None se l'utente non esiste. forza: sincronizza anche
+        # se l'ultima sincronizzazione è recente
+        if self._generazione is None or (username not in self.utenti and (
+                forza or time.monotonic() - self._ultimo > self.sincronizza_ogni)):
+            self._sincronizza()
+        return self.utenti.get(username)
+
+    def registra(self, username, hash_password, ws):
+        # False se lo username è già preso; il controllo e l'append sono atomici nel processo
+        with self._registrazioni:
+            if self.cerca(username, forza=True) is not None: return False
+            ws.append_row([username, hash_password])
+            with self._lock: self.utenti[username] = hash_password
+            return True
+
+# --- INDICE DEI CLUB ---
+# Club -> (riga del foglio, owner, membri) e utente -> club, dallo specchio del foglio Club.
+# Le righe nuove entrano con il delta, gli inviti fatti qui aggiornano indice e specchio
+# direttamente. Le modifiche fatte da altre istanze arrivano con la ricarica completa
+# dello specchio; l'indice si riallinea al massimo ogni AGGIORNA_CLUB_OGNI secondi.
+
+FOGLIO_CLUB = "Club"
+AGGIORNA_CLUB_OGNI = 60  # secondi
+
+def _membri(valore):
+    return [m for m in str(valore).split(",") if m]
+
+class IndiceClub:
+    def __init__(self, specchio, aggiorna_ogni=AGGIORNA_CLUB_OGNI):
+        self.specchio = specchio
+        self.aggiorna_ogni = aggiorna_ogni
+        self.club = {}
+        self.per_utente = {}
+        self._generazione = None
+        self._viste = 0
+        self._ultimo = None
+        self._lock = threading.RLock()
+        self._inviti = {}
+
+    def _sincronizza(self):
+        self.specchio.aggiorna()
+        generazione, header, grezzi = self.specchio.stato()
+        with self._lock:
+            if generazione != self._generazione:
+                self.club, self.per_utente, self._viste, self._generazione = {}, {}, 0, generazione
+            if len(grezzi) > self._viste and "NomeClub" in header:
+                pos = [header.index(c) for c in ["NomeClub", "Owner", "Membri"]]
+                nuove = grezzi.iloc[self._viste:, pos]
+                for i, (nome, owner, membri) in enumerate(zip(*(nuove[c] for c in nuove.columns)), start=self._viste + 2):
+                    self._imposta(nome, i, owner, _membri(membri))
+            self._viste = len(grezzi)
+            self._ultimo = time.monotonic()
+
+    def _imposta(self, nome, riga, owner, membri):
+        for m in self.club.get(nome, {}).get("members", []):
+            self.per_utente.get(m, {}).pop(nome, None)
+        self.club[nome] = {"riga": riga, "owner": owner, "members": membri}
+        for m in membri:
+            self.per_utente.setdefault(m, {})[nome] = None
+
+    def aggiorna(self, forza=False):
+        if forza or self._ultimo is None or time.monotonic() - self._ultimo > self.aggiorna_ogni:
+            self._sincronizza()
+        return self
+
+    def dati(self, nome):
+        return self.aggiorna().club.get(nome)
+
+    def clubs_di(self, username):
+        return list(self.aggiorna().per_utente.get(username, {}))
+
+    def invita(self, nome, usernames, ws):
+        # Aggiunge più membri con una lettura e una scrittura della cella Membri.
+        # Gli inviti allo stesso club sono serializzati e la lettura subito prima della
+        # scrittura non perde i membri aggiunti nel frattempo da altre istanze.
+        # Restituisce {username: "success" | "already_in"}, None se il club non c'è.
+        with self._lock:
+            lock = self._inviti.setdefault(nome, threading.Lock())
+        with lock:
+            for tentativo in range(2):
+                club = self.dati(nome)
+                if club is None: return None
+                valori = ws.get(f"A{club['riga']}:C{club['riga']}")
+                if valori and valori[0] and valori[0][0] == nome: break
+                # Righe spostate: si ricarica tutto e si riprova
+                self.specchio.invalida()
+                self.aggiorna(forza=True)
+            else:
+                return None
+            attuali = _membri((valori[0] + ["", "", ""])[2])
+            esito = {u: "already_in" if u in attuali else "success" for u in usernames}
+            nuovi = [u for u in dict.fromkeys(usernames) if u not in attuali]
+            if nuovi:
+                ws.update_cell(club["riga"], 3, ",".join(attuali + nuovi))
+            with self._lock:
+                self._imposta(nome, club["riga"], club["owner"], attuali + nuovi)
+            self.specchio.modifica(club["riga"] - 2, self.specchio.header.index("Membri"), ",".join(attuali + nuovi))
+            return esito
+
+class Archivio:
+    def __init__(self, sheet, snapshot=None):
+        self.sheet = sheet
+        self.snapshot = snapshot
+        self._fogli = {}
+        self._specchi = {}
+        self._indici = {}
+        self._utenti = None
+        self._club = None
+        self._creazioni = {}
+        self._lock = threading.RLock()
+
+    def foglio(self, nome):
+        # Il lock protegge solo il dizionario: l'apertura del foglio va in rete
+        with self._lock:
+            ws = self._fogli.get(nome)
+        if ws is None:
+            ws = self.sheet.worksheet(nome)
+            with self._lock: ws = self._fogli.setdefault(nome, ws)
+        return ws
+
+    def partizione(self, club_name, migra=True):
+        # migra=False per i club nuovi: non hanno righe nel foglio legacy, niente da leggere.
+        # Le creazioni sono serializzate per partizione, non su tutto l'archivio
+        nome = nome_partizione(club_name)
+        with self._lock:
+            lock = self._creazioni.setdefault(nome, threading.Lock())
+        with lock:
+            try:
+                return self.foglio(nome)
+            except gspread.WorksheetNotFound:
+                return self._crea_partizione(club_name, nome, migra)
+
+    def _crea_partizione(self, club_name, nome, migra):
+        righe = self._righe_legacy(club_name) if migra else []
+        try:
+            ws = self.sheet.add_worksheet(title=nome, rows=len(righe) + 1, cols=len(HEADER_PARTITE))
+        except gspread.exceptions.APIError:
+            # Creata nel frattempo da un altro processo
+            return self.foglio(nome)
+        ws.append_rows([HEADER_PARTITE] + righe)
+        with self._lock: self._fogli[nome] = ws
+        return ws
+
+    def _righe_legacy(self, club_name):
+        try:
+            ws = self.foglio(FOGLIO_LEGACY)
+        except gspread.WorksheetNotFound:
+            return []
+        return [[r.get(c, "") for c in HEADER_PARTITE] for r in ws.get_all_records() if str(r.get("Club")) == club_name]
+
+    def specchio(self, nome):
+        with self._lock:
+            if nome not in self._specchi:
+                self._specchi[nome] = SpecchioFoglio(lambda: self.foglio(nome), snapshot=self.snapshot, nome=nome)
+            return self._specchi[nome]
+
+    def specchio_partite(self, club_name):
+        nome = nome_partizione(club_name)
+        with self._lock:
+            if nome not in self._specchi:
+                self._specchi[nome] = SpecchioFoglio(lambda: self.partizione(club_name), snapshot=self.snapshot, nome=nome, testuali=TESTUALI_PARTITE)
+            return self._specchi[nome]
+
+    def utenti(self):
+        with self._lock:
+            if self._utenti is None: self._utenti = IndiceUtenti(self.specchio(FOGLIO_UTENTI))
+            return self._utenti
+
+    def registra_utente(self, username, hash_password):
+        return self.utenti().registra(username, hash_password, self.foglio(FOGLIO_UTENTI))
+
+    def clubs(self):
+        with self._lock:
+            if self._club is None: self._club = IndiceClub(self.specchio(FOGLIO_CLUB))
+            return self._club
+
+    def crea_club(self, nome, owner):
+        indice = self.clubs()
+        with indice._lock:
+            if indice.aggiorna(forza=True).club.get(nome): return False
+            self.foglio(FOGLIO_CLUB).append_row([nome, owner, owner])
+            indice.aggiorna(forza=True)
+        self.partizione(nome, migra=False)
+        return True
+
+    def invita(self, club_name, usernames):
+        return self.clubs().invita(club_name, usernames, self.foglio(FOGLIO_CLUB))
+
+    def avvia(self, intestazioni=(), paralleli=8):
+        # Lettura iniziale: specchi di Utenti, Club e di tutte le partizioni, più la sola
+        # riga di intestazione dei fogli in "intestazioni", con una richiesta batch.
+        # Se il backend non la supporta si legge in parallelo. Restituisce {foglio: header}.
+        fogli = self.sheet.worksheets()
+        with self._lock:
+            for ws in fogli: self._fogli.setdefault(ws.title, ws)
+        titoli = [ws.title for ws in fogli]
+        specchi = [self.specchio(t) for t in titoli if t in (FOGLIO_UTENTI, FOGLIO_CLUB) or t.startswith(PREFISSO_PARTIZIONE)]
+        intestazioni = [t for t in intestazioni if t in titoli]
+        richieste = [s.richiesta() for s in specchi]
+        intervalli = [absolute_range_name(s.nome, r) for s, (r, _) in zip(specchi, richieste)]
+        intervalli += [absolute_range_name(t, "1:1") for t in intestazioni]
+        try:
+            risposta = self.sheet.values_batch_get(intervalli)["valueRanges"]
+        except (AttributeError, gspread.exceptions.APIError):
+            with ThreadPoolExecutor(paralleli) as pool:
+                list(pool.map(lambda s: s.precarica(), specchi))
+                return dict(zip(intestazioni, pool.map(lambda t: self._fogli[t].row_values(1), intestazioni)))
+        for s, (_, delta), r in zip(specchi, richieste, risposta):
+            s.applica(r.get("values", []), delta)
+        return {t: (r.get("values") or [[]])[0] for t, r in zip(intestazioni, risposta[len(specchi):])}
+
+    def filtro_duplicati(self, club_name):
+        nome = nome_partizione(club_name)
+        with self._lock:
+            if nome not in self._indici:
+                self._indici[nome] = IndiceDuplicati(self.specchio_partite(club_name))
+            indice = self._indici[nome]
+        return FiltroDuplicati(indice.aggiorna())
+
+    def leggi_partite(self, club_name):
+        return self.specchio_partite(club_name).aggiorna()
+
+    def scrivi_partite(self, club_name, righe):
+        if righe: self.partizione(club_name).append_rows(righe)
@@ -0,0 +1,246 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import gspread
+import numpy as np
+import requests
+from gspread.cell import Cell
+from gspread.utils import a1_to_rowcol, numericise_all, to_records
+
+from archivio import FOGLIO_CLUB, FOGLIO_UTENTI, HEADER_PARTITE, nome_partizione
+
+# --- BACKEND LOCALE (offline) ---
+# Imitazione minima di un file Google Sheets, con gli stessi metodi che l'app usa su
+# Spreadsheet e Worksheet. Ogni foglio è un CSV in CARTELLA_LOCALE; al primo avvio i fogli
+# vengono creati dai file del repo: users.json, clubs.json e games_log.csv.
+# Si attiva con POKER_BACKEND=locale, per sviluppo e prove senza credenziali.
+
+CARTELLA_LOCALE = "dati_locali"
+
+def _testo(v):
+    # Come la visualizzazione di Sheets: 20.0 -> "20"
+    if isinstance(v, float) and v.is_integer(): return str(int(v))
+    return "" if v is None else str(v)
+
+class FoglioLocale:
+    def __init__(self, archivio, title, valori=None):
+        self.archivio = archivio
+        self.title = title
+        self.valori = valori or []
+
+    def _salva(self):
+        self.archivio._salva(self)
+
+    def get_all_values(self, **kw):
+        return [list(r) for r in self.valori]
+
+    def get_all_records(self, **kw):
+        if not self.valori: return []
+        header = self.valori[0]
+        righe = [numericise_all((r + [""] * len(header))[:len(header)]) for r in self.valori[1:]]
+        return to_records(header, righe)
+
+    def get(self, intervallo=None, **kw):
+        if intervallo is None: return self.get_all_values()
+        inizio, _, fine = intervallo.partition(":")
+        r0 = int(re.sub(r"[A-Z]+", "", inizio) or 1)
+        r1 = re.sub(r"[A-Z]+", "", fine)
+        colonne = re.sub(r"\d+", "", fine or inizio)
+        c1 = a1_to_rowcol(colonne + "1")[1] if colonne else None
+        valori = [r[:c1] for r in self.valori[r0 - 1:int(r1) if r1 else None]]
+        while valori and not any(valori[-1]): valori.pop()
+        return valori
+
+    def row_values(self, riga, **kw):
+        return list(self.valori[riga - 1]) if riga <= len(self.valori) else []
+
+    def col_values(self, colonna, **kw):
+        valori = [r[colonna - 1] if len(r) >= colonna else "" for r in self.valori]
+        while valori and not valori[-1]: valori.pop()
+        return valori
+
+    def append_row(self, riga, **kw):
+        self.append_rows([riga])
+
+    def append_rows(self, righe, **kw):
+        with self.archivio._lock:
+            self.valori.extend([_testo(v) for v in r] for r in righe)
+            self._salva()
+        return {}
+
+    def find(self, testo, **kw):
+        for i, r in enumerate(self.valori):
+            for j, v in enumerate(r):
+                if v == testo: return Cell(i + 1, j + 1, v)
+        return None
+
+    def cell(self, riga, colonna, **kw):
+        r = self.row_values(riga)
+        return Cell(riga, colonna, r[colonna - 1] if colonna <= len(r) else "")
+
+    def update_cell(self, riga, colonna, valore):
+        with self.archivio._lock:
+            while len(self.valori) < riga: self.valori.append([])
+            r = self.valori[riga - 1]
+            r.extend([""] * (colonna - len(r)))
+            r[colonna - 1] = _testo(valore)
+            self._salva()
+
+class ArchivioLocale:
+    Foglio = FoglioLocale
+
+    def __init__(self, cartella=CARTELLA_LOCALE):
+        self.cartella = cartella
+        self._lock = threading.RLock()
+        self._fogli = {}
+        os.makedirs(cartella, exist_ok=True)
+        with open(os.path.join(cartella, "indice.json"), "a+") as f:
+            f.seek(0)
+            titoli = json.loads(f.read() or "[]")
+        for titolo in titoli:
+            with open(self._percorso(titolo), newline="", encoding="utf-8") as f:
+                self._fogli[titolo] = self.Foglio(self, titolo, [r for r in csv.reader(f)])
+        if not self._fogli: self._semina()
+
+    def _percorso(self, titolo):
+        return os.path.join(self.cartella, re.sub(r"[^\w.-]+", "_", titolo) + "-" + hashlib.sha1(titolo.encode()).hexdigest()[:8] + ".csv")
+
+    def _salva(self, foglio):
+        tmp = self._percorso(foglio.title) + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f: csv.writer(f).writerows(foglio.valori)
+        os.replace(tmp, self._percorso(foglio.title))
+
+    def _salva_indice(self):
+        with open(os.path.join(self.cartella, "indice.json"), "w") as f: json.dump(list(self._fogli), f)
+
+    def _semina(self):
+        utenti, clubs = {}, {}
+        if os.path.exists("users.json"):
+            with open("users.json") as f: utenti = json.load(f)
+        if os.path.exists("clubs.json"):
+            with open("clubs.json") as f: clubs = json.load(f)
+        self.add_worksheet("Utenti", 0, 0).append_rows([["Username", "Password"]] + [[u, d["password"]] for u, d in utenti.items()])
+        self.add_worksheet("Club", 0, 0).append_rows([["NomeClub", "Owner", "Membri"]] + [[c, d["owner"], ",".join(d["members"])] for c, d in clubs.items()])
+        partite = [["Data", "Giocatore", "BuyIn", "CashOut", "Profitto", "Club"]]
+        if os.path.exists("games_log.csv"):
+            with open("games_log.csv", newline="", encoding="utf-8") as f:
+                partite += [[r["Data"], r["Giocatore"], float(r["BuyIn"]), float(r["CashOut"]), float(r["Profitto"]), r["Club"]] for r in csv.DictReader(f)]
+        self.add_worksheet("Partite", 0, 0).append_rows(partite)
+
+    def worksheet(self, titolo):
+        with self._lock:
+            if titolo not in self._fogli: raise gspread.WorksheetNotFound(titolo)
+            return self._fogli[titolo]
+
+    def worksheets(self, **kw):
+        return list(self._fogli.values())
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        with self._lock:
+            self._fogli[title] = self.Foglio(self, title)
+            self._salva(self._fogli[title])
+            self._salva_indice()
+            return self._fogli[title]
+
+# --- BACKEND SIMULATO (benchmark) ---
+# Come il backend locale ma tutto in memoria, con i costi di Google Sheets: ogni richiesta
+# aspetta `latenza` secondi più `per_riga` per ogni riga trasferita, e oltre `quota`
+# richieste al minuto risponde 429 come l'API vera. Ha anche values_batch_get, quindi
+# l'avvio segue lo stesso percorso che ha con Sheets. Si semina da un DataFrame nello
+# schema di games_log.csv, già diviso nelle partizioni per club.
+
+LATENZA = 0.05
+LATENZA_PER_RIGA = 0.00002
+QUOTA_MINUTO = 60  # richieste al minuto per utente, come il limite di default di Sheets
+HASH_SINTETICO = hashlib.sha256(b"poker").hexdigest()  # password "poker" per tutti gli utenti seminati
+
+def errore_quota_simulato():
+    risposta = requests.Response()
+    risposta.status_code = 429
+    risposta._content = json.dumps({"error": {"code": 429, "message": "Quota exceeded (simulata)", "status": "RESOURCE_EXHAUSTED"}}).encode()
+    return gspread.exceptions.APIError(risposta)
+
+def _simulata(nome):
+    originale = getattr(FoglioLocale, nome)
+    def metodo(self, *args, **kw):
+        self.archivio._richiesta()
+        risultato = originale(self, *args, **kw)
+        righe = len(args[0]) if nome == "append_rows" else len(risultato) if isinstance(risultato, list) else 1
+        self.archivio._trasferimento(righe)
+        return risultato
+    return metodo
+
+class FoglioSimulato(FoglioLocale):
+    pass
+
+# append_row e cell passano da append_rows e row_values: contano una volta sola
+for _nome in ["get_all_values", "get_all_records", "get", "row_values", "col_values", "append_rows", "find", "update_cell"]:
+    setattr(FoglioSimulato, _nome, _simulata(_nome))
+
+def _colonna_testo(serie):
+    valori = serie.to_numpy()
+    if valori.dtype.kind == "f":
+        interi = np.isfinite(valori) & (valori == np.round(valori))
+        return np.where(interi, np.nan_to_num(valori).astype(np.int64).astype(str), valori.astype(str))
+    return valori.astype(str)
+
+class ArchivioSimulato(ArchivioLocale):
+    Foglio = FoglioSimulato
+
+    def __init__(self, partite=None, latenza=LATENZA, per_riga=LATENZA_PER_RIGA, quota=QUOTA_MINUTO):
+        self._lock = threading.RLock()
+        self._fogli = {}
+        self.latenza, self.per_riga, self.quota = latenza, per_riga, quota
+        self._finestra = deque()
+        self.richieste = self.rifiutate = 0
+        if partite is not None: self._semina_da(partite)
+
+    def _salva(self, foglio): pass
+    def _salva_indice(self): pass
+
+    def _semina_da(self, partite):
+        # Senza contare richieste: è lo stato del file prima del benchmark
+        membri = partite.groupby("Club", sort=True)["Giocatore"].unique()
+        self._fogli[FOGLIO_UTENTI] = FoglioSimulato(self, FOGLIO_UTENTI, [["Username", "Password"]] + [[u, HASH_SINTETICO] for u in sorted(partite["Giocatore"].unique())])
+        self._fogli[FOGLIO_CLUB] = FoglioSimulato(self, FOGLIO_CLUB, [["NomeClub", "Owner", "Membri"]] + [[c, m[0], ",".join(m)] for c, m in membri.items()])
+        testo = np.column_stack([_colonna_testo(partite[c]) for c in HEADER_PARTITE])
+        for club_name, righe in partite.groupby("Club", sort=True).indices.items():
+            nome = nome_partizione(club_name)
+            self._fogli[nome] = FoglioSimulato(self, nome, [list(HEADER_PARTITE)] + testo[righe].tolist())
+
+    def _richiesta(self):
+        with self._lock:
+            adesso = time.monotonic()
+            while self._finestra and adesso - self._finestra[0] > 60: self._finestra.popleft()
+            if self.quota and len(self._finestra) >= self.quota:
+                self.rifiutate += 1
+                raise errore_quota_simulato()
+            self._finestra.append(adesso)
+            self.richieste += 1
+
+    def _trasferimento(self, righe):
+        time.sleep(self.latenza + self.per_riga * righe)
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        self._richiesta()
+        foglio = super().add_worksheet(title, rows, cols, index)
+        self._trasferimento(1)
+        return foglio
+
+    def values_batch_get(self, intervalli, **kw):
+        self._richiesta()
+        risposta = []
+        for intervallo in intervalli:
+            titolo, _, celle = intervallo.rpartition("!") if "!" in intervallo else (intervallo, "", "")
+            foglio = self._fogli.get(titolo.strip("'").replace("''", "'"))
+            if foglio is None: valori = []
+            else: valori = FoglioLocale.get(foglio, celle) if celle else [list(r) for r in foglio.valori]
+            risposta.append({"range": intervallo, "values": valori})
+        self._trasferimento(sum(len(r["values"]) for r in risposta))
+        return {"valueRanges": risposta}
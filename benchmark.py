@@ -0,0 +1,195 @@
+import argparse
+import gc
+import io
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import grafici
+import statistiche
+from archivio import Archivio
+from backend_locale import LATENZA, LATENZA_PER_RIGA, ArchivioSimulato
+from importazione import ImportazioneRiprendibile, TokenBucket, righe_da_frame, righe_file
+from sintetici import genera_partite
+
+# --- BENCHMARK ---
+# Gli stessi percorsi dell'app (avvio e lettura, tabella e istantanea delle statistiche,
+# grafici, importazione, salvataggio di una sessione) su dati sintetici e sul backend
+# simulato, senza rete né credenziali. Ogni caso parte da uno stato nuovo: il tempo è il
+# migliore di --ripetizioni giri, la memoria di picco (tracemalloc) viene da un giro a parte.
+#   python benchmark.py --taglie piccola media --salva base.json
+#   python benchmark.py --taglie piccola media --confronta base.json   (esce con 1 se peggiora)
+
+TAGLIE = {  # righe, giocatori, club
+    "piccola": (10_000, 200, 20),
+    "media": (100_000, 1_000, 100),
+    "grande": (1_000_000, 5_000, 1_000),
+}
+TOLLERANZA = 0.25  # oltre +25% di tempo o memoria rispetto alla base è una regressione
+
+def _club_grande(dati):
+    return dati["Club"].value_counts().index[0]
+
+def _backend(dati, opzioni):
+    return ArchivioSimulato(dati, latenza=opzioni.latenza, per_riga=opzioni.per_riga, quota=opzioni.quota)
+
+def _archivio_avviato(dati, opzioni):
+    archivio = Archivio(_backend(dati, opzioni))
+    archivio.avvia()
+    return archivio
+
+# Ogni caso: prepara(dati, opzioni) -> stato (non misurato), esegui(stato) misurato
+def caso_avvio(dati, opzioni):
+    return (lambda: Archivio(_backend(dati, opzioni))), lambda archivio: archivio.avvia()
+
+def caso_lettura_club(dati, opzioni):
+    club_name = _club_grande(dati)
+    # Senza avvio: il primo accesso al club legge la sua partizione da sola
+    return (lambda: Archivio(_backend(dati, opzioni))), lambda archivio: archivio.leggi_partite(club_name)
+
+def caso_tabella(dati, opzioni):
+    return (lambda: dati), statistiche.tabella_partite
+
+def caso_statistiche_club(dati, opzioni):
+    partite = statistiche.tabella_partite(dati[dati["Club"] == _club_grande(dati)])
+    return (lambda: partite), lambda p: statistiche.istantanea(statistiche.cubo_statico(p))
+
+def caso_classifica_globale(dati, opzioni):
+    tabelle = [statistiche.tabella_partite(g) for _, g in dati.groupby("Club", sort=False)]
+    return (lambda: tabelle), statistiche.classifica_globale
+
+def caso_testa_a_testa(dati, opzioni):
+    partite = statistiche.tabella_partite(dati[dati["Club"] == _club_grande(dati)])
+    return (lambda: partite), lambda p: statistiche.testa_a_testa(statistiche.matrici_tavolo(p))
+
+def caso_grafici(dati, opzioni):
+    partite = statistiche.tabella_partite(dati[dati["Club"] == _club_grande(dati)])
+    snap = statistiche.istantanea(statistiche.cubo_statico(partite))
+    def esegui(snap):
+        giocatore = snap["classifica"].index[0]
+        profitti = statistiche.in_euro(snap["partite"][snap["partite"]["Giocatore"] == giocatore]).groupby("Data")["Profitto"].sum()
+        profitti = profitti.reindex(snap["date"], fill_value=0)
+        figure = [grafici.figura_bankroll(profitti.index, profitti.cumsum()), grafici.figura_trono(snap["trono"]), grafici.figura_polso(snap["polso"])]
+        return sum(len(f.to_json()) for f in figure)
+    return (lambda: snap), esegui
+
+def caso_importazione(dati, opzioni):
+    # Come un export Excel italiano: date gg/mm/aaaa, importi "€ 20,00" e cella vuota
+    # per chi esce a zero
+    origine = dati[dati["Club"] == _club_grande(dati)].drop(columns="Club")
+    euro = lambda v: f"€ {v:.2f}".replace(".", ",")
+    origine = origine.assign(Data=pd.to_datetime(origine["Data"]).dt.strftime("%d/%m/%Y"), BuyIn=origine["BuyIn"].map(euro),
+                             CashOut=origine["CashOut"].map(euro).where(origine["CashOut"] != 0))
+    contenuto = origine.to_csv(index=False).encode()
+    # Controllo una tantum: le celle vuote diventano 0 (un NaN farebbe rifiutare l'append da Sheets)
+    letti = np.array([r[2:5] for r in righe_file(io.BytesIO(contenuto), "storico.csv", "Club Importato")], dtype=float)
+    attesi = dati.loc[origine.index, ["BuyIn", "CashOut", "Profitto"]].to_numpy(dtype=float)
+    if letti.shape != attesi.shape or not np.array_equal(letti, attesi):
+        raise ValueError("caso_importazione: importi letti diversi da quelli esportati")
+    cartella = tempfile.mkdtemp(prefix="benchmark-")
+    def prepara():
+        archivio = _archivio_avviato(dati, opzioni)
+        ws = archivio.partizione("Club Importato")
+        return archivio, ws
+    def esegui(stato):
+        archivio, ws = stato
+        righe = righe_file(io.BytesIO(contenuto), "storico.csv", "Club Importato")
+        limitatore = TokenBucket(ritmo=1000, capacita=1000, ritmo_max=1000)
+        ImportazioneRiprendibile(ws, f"benchmark-{time.monotonic_ns()}", righe, len(origine), limitatore, cartella=cartella,
+                                 filtro=archivio.filtro_duplicati("Club Importato")).esegui()
+    return prepara, esegui
+
+def caso_salvataggio(dati, opzioni):
+    club_name = _club_grande(dati)
+    giocatori = dati.loc[dati["Club"] == club_name, "Giocatore"].unique()[:8]
+    sessione = pd.DataFrame({"Data": "2030-01-01", "Giocatore": giocatori, "BuyIn": 20.0, "CashOut": 20.0, "Profitto": 0.0})
+    def esegui(archivio):
+        # Come salva_partita dell'app: righe, filtro dei duplicati, append
+        righe = righe_da_frame(sessione, club_name)
+        nuova = archivio.filtro_duplicati(club_name)
+        archivio.scrivi_partite(club_name, [r for r in righe if nuova(r)])
+    return (lambda: _archivio_avviato(dati, opzioni)), esegui
+
+CASI = {
+    "avvio": caso_avvio,
+    "lettura_club": caso_lettura_club,
+    "tabella": caso_tabella,
+    "statistiche_club": caso_statistiche_club,
+    "classifica_globale": caso_classifica_globale,
+    "testa_a_testa": caso_testa_a_testa,
+    "grafici": caso_grafici,
+    "importazione": caso_importazione,
+    "salvataggio": caso_salvataggio,
+}
+
+def misura(prepara, esegui, ripetizioni):
+    tempi = []
+    for _ in range(ripetizioni):
+        stato = prepara()
+        gc.collect()
+        inizio = time.perf_counter()
+        esegui(stato)
+        tempi.append(time.perf_counter() - inizio)
+    stato = prepara()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        esegui(stato)
+        _, picco = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"secondi": min(tempi), "mediana": float(np.median(tempi)), "picco_mib": picco / 2**20}
+
+def esegui_suite(taglie, casi, ripetizioni, opzioni):
+    risultati = {}
+    for taglia in taglie:
+        righe, giocatori, clubs = TAGLIE[taglia]
+        dati = genera_partite(righe, giocatori, clubs, seme=0)
+        for nome in casi:
+            prepara, esegui = CASI[nome](dati, opzioni)
+            risultati[f"{taglia}/{nome}"] = r = misura(prepara, esegui, ripetizioni)
+            print(f"{taglia:<8} {nome:<20} {r['secondi']:>9.3f} s {r['mediana']:>9.3f} s {r['picco_mib']:>9.1f} MiB", flush=True)
+    return risultati
+
+def confronta(risultati, base, tolleranza=TOLLERANZA):
+    # Casi peggiorati oltre la tolleranza rispetto alla base: [(caso, misura, prima, dopo)]
+    peggiorati = []
+    for chiave, r in risultati.items():
+        if chiave not in base: continue
+        for misura_ in ["secondi", "picco_mib"]:
+            if r[misura_] > base[chiave][misura_] * (1 + tolleranza):
+                peggiorati.append((chiave, misura_, base[chiave][misura_], r[misura_]))
+    return peggiorati
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline: dati sintetici e backend Sheets simulato.")
+    parser.add_argument("--taglie", nargs="+", choices=list(TAGLIE), default=["piccola", "media"])
+    parser.add_argument("--casi", nargs="+", choices=list(CASI), default=list(CASI))
+    parser.add_argument("--ripetizioni", type=int, default=3)
+    parser.add_argument("--latenza", type=float, default=LATENZA, help="secondi per richiesta")
+    parser.add_argument("--per-riga", type=float, default=LATENZA_PER_RIGA, help="secondi per riga trasferita")
+    parser.add_argument("--quota", type=int, default=0, help="richieste al minuto (0 = nessun limite)")
+    parser.add_argument("--salva", help="scrive i risultati in JSON")
+    parser.add_argument("--confronta", help="JSON di una corsa precedente da usare come base")
+    parser.add_argument("--tolleranza", type=float, default=TOLLERANZA)
+    opzioni = parser.parse_args(argv)
+
+    print(f"{'taglia':<8} {'caso':<20} {'migliore':>11} {'mediana':>11} {'picco':>13}")
+    risultati = esegui_suite(opzioni.taglie, opzioni.casi, opzioni.ripetizioni, opzioni)
+    if opzioni.salva:
+        with open(opzioni.salva, "w") as f: json.dump(risultati, f, indent=1)
+    if opzioni.confronta:
+        with open(opzioni.confronta) as f: base = json.load(f)
+        peggiorati = confronta(risultati, base, opzioni.tolleranza)
+        for chiave, misura_, prima, dopo in peggiorati:
+            print(f"REGRESSIONE {chiave} {misura_}: {prima:.3f} -> {dopo:.3f} ({(dopo / prima - 1) * 100:+.0f}%)")
+        if peggiorati: sys.exit(1)
+        print("Nessuna regressione oltre la tolleranza.")
+
+if __name__ == "__main__":
+    main()
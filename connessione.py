@@ -0,0 +1,26 @@
+import os
+
+import gspread
+from oauth2client.service_account import ServiceAccountCredentials
+
+from archivio import Archivio, ArchivioSnapshot, CARTELLA_SNAPSHOT
+from backend_locale import ArchivioLocale
+from metriche import HTTPClientMisurato
+
+# --- CONNESSIONE ---
+# Condivisa tra l'app Streamlit e gli script da riga di comando.
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+CREDENTIALS_FILE = "credentials.json"
+SHEET_NAME = "PokerDB"
+# "locale" = niente Google Sheets: fogli in CSV su disco, creati da games_log.csv
+BACKEND = os.environ.get("POKER_BACKEND", "sheets")
+
+def apri_foglio():
+    if BACKEND == "locale": return ArchivioLocale()
+    creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_FILE, SCOPE)
+    return gspread.authorize(creds, http_client=HTTPClientMisurato).open(SHEET_NAME)
+
+def apri_archivio(sheet):
+    # Lo snapshot è per backend: i dati locali non devono finire negli specchi di Sheets
+    return Archivio(sheet, ArchivioSnapshot(os.path.join(CARTELLA_SNAPSHOT, BACKEND)))
@@ -0,0 +1,154 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+# --- DIARIO DELLE SESSIONI LIVE (write-behind) ---
+# Ogni "Aggiungi alla lista" finisce subito in un journal SQLite su disco, quindi un
+# refresh del browser o un riavvio non perdono il tavolo. "SALVA SESSIONE" chiude la
+# sessione e basta: un thread in background la invia a Google Sheets insieme alle
+# altre sessioni chiuse dello stesso club, riprovando con backoff se qualcosa va storto.
+# Le sessioni chiuse e non ancora inviate restano nel diario e vengono riprese al riavvio.
+# Chi prende una sessione da inviare ne ha l'esclusiva per DURATA_INVIO secondi: più
+# processi possono condividere il diario, e un invio interrotto da un riavvio torna in
+# coda solo quando quella esclusiva scade, non appena un altro processo si avvia.
+
+FILE_DIARIO = "sessioni_live.db"
+INTERVALLO_FLUSH = 5  # secondi tra un giro e l'altro del flusher
+ATTESA_MAX = 300      # tetto del backoff tra due tentativi
+CONSERVA_INVIATE = 30 * 24 * 3600
+DURATA_INVIO = 600    # secondi di esclusiva su una sessione in invio
+
+APERTA, CHIUSA, IN_INVIO, INVIATA = "aperta", "chiusa", "in_invio", "inviata"
+COLONNE_RIGA = ["Data", "Giocatore", "BuyIn", "CashOut", "Profitto"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessioni (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    club TEXT NOT NULL,
+    host TEXT NOT NULL,
+    stato TEXT NOT NULL,
+    creata REAL NOT NULL,
+    chiusa REAL,
+    inviata REAL,
+    prossimo_tentativo REAL,
+    tentativi INTEGER NOT NULL DEFAULT 0,
+    errore TEXT,
+    duplicate INTEGER,
+    invio_scade REAL
+);
+CREATE TABLE IF NOT EXISTS righe (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sessione_id INTEGER NOT NULL REFERENCES sessioni(id),
+    data TEXT NOT NULL,
+    giocatore TEXT NOT NULL,
+    buyin REAL NOT NULL,
+    cashout REAL NOT NULL,
+    profitto REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessioni_club_stato ON sessioni(club, stato);
+CREATE INDEX IF NOT EXISTS righe_sessione ON righe(sessione_id);
+"""
+
+class Diario:
+    def __init__(self, percorso=FILE_DIARIO):
+        self.percorso = percorso
+        self._sveglia = threading.Event()
+        self._flusher = None
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            # Diari creati prima dell'esclusiva sugli invii
+            if "invio_scade" not in [c[1] for c in db.execute("PRAGMA table_info(sessioni)")]:
+                db.execute("ALTER TABLE sessioni ADD COLUMN invio_scade REAL")
+            vecchie = "SELECT id FROM sessioni WHERE stato=? AND inviata < ?"
+            limite = time.time() - CONSERVA_INVIATE
+            db.execute(f"DELETE FROM righe WHERE sessione_id IN ({vecchie})", (INVIATA, limite))
+            db.execute(f"DELETE FROM sessioni WHERE id IN ({vecchie})", (INVIATA, limite))
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.percorso, timeout=30)
+        try:
+            with db: yield db
+        finally:
+            db.close()
+
+    # --- TAVOLO APERTO ---
+    def sessione_aperta(self, club_name, host):
+        with self._db() as db:
+            r = db.execute("SELECT id FROM sessioni WHERE club=? AND host=? AND stato=? ORDER BY id DESC LIMIT 1", (club_name, host, APERTA)).fetchone()
+        return r[0] if r else None
+
+    def aggiungi_riga(self, club_name, host, riga):
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            r = db.execute("SELECT id FROM sessioni WHERE club=? AND host=? AND stato=? ORDER BY id DESC LIMIT 1", (club_name, host, APERTA)).fetchone()
+            sessione_id = r[0] if r else db.execute("INSERT INTO sessioni (club, host, stato, creata) VALUES (?, ?, ?, ?)", (club_name, host, APERTA, time.time())).lastrowid
+            db.execute("INSERT INTO righe (sessione_id, data, giocatore, buyin, cashout, profitto) VALUES (?, ?, ?, ?, ?, ?)",
+                       (sessione_id, str(riga["Data"]), riga["Giocatore"], float(riga["BuyIn"]), float(riga["CashOut"]), float(riga["Profitto"])))
+        return sessione_id
+
+    def righe(self, *sessioni):
+        if not sessioni: return pd.DataFrame(columns=COLONNE_RIGA)
+        with self._db() as db:
+            valori = db.execute(f"SELECT data, giocatore, buyin, cashout, profitto FROM righe WHERE sessione_id IN ({','.join('?' * len(sessioni))}) ORDER BY sessione_id, id", sessioni).fetchall()
+        return pd.DataFrame(valori, columns=COLONNE_RIGA)
+
+    def chiudi(self, sessione_id):
+        adesso = time.time()
+        with self._db() as db:
+            db.execute("UPDATE sessioni SET stato=?, chiusa=?, prossimo_tentativo=? WHERE id=? AND stato=?", (CHIUSA, adesso, adesso, sessione_id, APERTA))
+        self._sveglia.set()
+
+    # --- CODA DI INVIO ---
+    def in_attesa(self, club_name):
+        with self._db() as db:
+            valori = db.execute("""SELECT s.id, s.chiusa, COUNT(r.id), s.tentativi, s.errore FROM sessioni s LEFT JOIN righe r ON r.sessione_id = s.id
+                                   WHERE s.club=? AND s.stato IN (?, ?) GROUP BY s.id ORDER BY s.id""", (club_name, CHIUSA, IN_INVIO)).fetchall()
+        df = pd.DataFrame(valori, columns=["Sessione", "Chiusa", "Righe", "Tentativi", "Ultimo Errore"])
+        df["Chiusa"] = pd.to_datetime(df["Chiusa"], unit="s")
+        return df
+
+    def ultima_inviata(self, club_name):
+        with self._db() as db:
+            return db.execute("SELECT id, inviata, duplicate FROM sessioni WHERE club=? AND stato=? ORDER BY inviata DESC LIMIT 1", (club_name, INVIATA)).fetchone()
+
+    def avvia(self, invia, intervallo=INTERVALLO_FLUSH):
+        # invia(club_name, df_righe) -> righe duplicate saltate; deve essere idempotente
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._ciclo, args=(invia, intervallo), name="flusher-sessioni", daemon=True)
+            self._flusher.start()
+
+    def _ciclo(self, invia, intervallo):
+        while True:
+            self.invia_pronte(invia)
+            self._sveglia.wait(intervallo)
+            self._sveglia.clear()
+
+    def invia_pronte(self, invia):
+        adesso = time.time()
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            # Pronte: chiuse e in attesa, o in invio con l'esclusiva scaduta (processo fermato a metà)
+            pronte = db.execute("""SELECT id, club, tentativi FROM sessioni
+                                    WHERE (stato=? AND prossimo_tentativo <= ?) OR (stato=? AND COALESCE(invio_scade, 0) < ?) ORDER BY id""",
+                                (CHIUSA, adesso, IN_INVIO, adesso)).fetchall()
+            db.executemany("UPDATE sessioni SET stato=?, invio_scade=? WHERE id=?", [(IN_INVIO, adesso + DURATA_INVIO, s[0]) for s in pronte])
+        per_club = {}
+        for sessione_id, club_name, tentativi in pronte:
+            per_club.setdefault(club_name, []).append((sessione_id, tentativi))
+        # Un solo append per club, con tutte le sue sessioni chiuse
+        for club_name, sessioni in per_club.items():
+            ids = [s[0] for s in sessioni]
+            try:
+                duplicate = invia(club_name, self.righe(*ids))
+            except Exception as e:
+                with self._db() as db:
+                    db.executemany("UPDATE sessioni SET stato=?, tentativi=?, errore=?, prossimo_tentativo=? WHERE id=?",
+                                   [(CHIUSA, t + 1, str(e), time.time() + min(ATTESA_MAX, INTERVALLO_FLUSH * 2 ** t), i) for i, t in sessioni])
+                continue
+            with self._db() as db:
+                db.executemany("UPDATE sessioni SET stato=?, inviata=?, errore=NULL, duplicate=? WHERE id=?", [(INVIATA, time.time(), duplicate or 0, i) for i in ids])
@@ -0,0 +1,131 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+import metriche
+
+# --- GRAFICI A TRACCE COSTANTI ---
+# Bankroll e Trono disegnano una traccia per colore (o per leader), non una per segmento:
+# i segmenti dello stesso colore stanno in un'unica traccia separati da None.
+# Sopra MAX_PUNTI_GRAFICO punti la serie viene ridotta con LTTB, che tiene picchi e
+# valli: tempo di disegno e dimensione della pagina restano costanti con lo storico.
+
+MAX_PUNTI_GRAFICO = 1500  # 0 = nessuna riduzione
+
+def lttb(x, y, soglia):
+    # Largest-Triangle-Three-Buckets: indici dei punti da tenere, primo e ultimo compresi
+    n = len(y)
+    if soglia <= 2 or n <= soglia: return np.arange(n)
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    confini = np.linspace(1, n - 1, soglia - 1).astype(int)
+    indici = np.empty(soglia, dtype=int)
+    indici[0], indici[-1] = 0, n - 1
+    a = 0
+    for i in range(soglia - 2):
+        inizio, fine = confini[i], confini[i + 1]
+        if i + 2 < len(confini):
+            mx, my = x[fine:confini[i + 2]].mean(), y[fine:confini[i + 2]].mean()
+        else:
+            mx, my = x[-1], y[-1]
+        area = np.abs((x[a] - mx) * (y[inizio:fine] - y[a]) - (x[a] - x[inizio:fine]) * (my - y[a]))
+        a = inizio + int(area.argmax())
+        indici[i + 1] = a
+    return indici
+
+def _riduci(date, valori, max_punti):
+    if not max_punti: return np.arange(len(valori))
+    return lttb(date.astype("datetime64[ns]").astype("int64"), valori, max_punti)
+
+def _segmenti(x, y, maschera):
+    # Segmenti (x[i-1], y[i-1]) -> (x[i], y[i]) per gli i selezionati, separati da None
+    fine = np.flatnonzero(maschera) + 1
+    vuoto = np.full(len(fine), None, dtype=object)
+    xs = np.column_stack([x[fine - 1], x[fine], vuoto]).ravel()
+    ys = np.column_stack([y[fine - 1], y[fine], vuoto]).ravel()
+    return xs, ys
+
+@metriche.misurata("grafico:bankroll")
+def figura_bankroll(date, cumulato, max_punti=MAX_PUNTI_GRAFICO):
+    # date e cumulato comprendono già il punto zero iniziale
+    tenuti = _riduci(date, cumulato, max_punti)
+    x = np.asarray(date, dtype=object)[tenuti]
+    y = np.asarray(cumulato, dtype=float)[tenuti]
+    # Colore del tratto = segno della variazione (sul grafico pieno è il profitto della sessione)
+    passo = np.round(np.diff(y), 2)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=x, y=np.where(y > 0, y, 0), fill='tozeroy', fillcolor="rgba(0, 204, 150, 0.2)", mode='none', hoverinfo='skip', showlegend=False))
+    fig.add_trace(go.Scatter(x=x, y=np.where(y < 0, y, 0), fill='tozeroy', fillcolor="rgba(239, 85, 59, 0.2)", mode='none', hoverinfo='skip', showlegend=False))
+    width_line = 3
+    for maschera, colore, nome, tratto in [(passo > 0, "#00CC96", "Vittoria", None), (passo < 0, "#EF553B", "Sconfitta", None), (passo == 0, "#636EFA", "Assente/Pari", 'dot')]:
+        xs, ys = _segmenti(x, y, maschera)
+        fig.add_trace(go.Scatter(x=xs, y=ys, mode='lines+markers', line=dict(color=colore, width=width_line, dash=tratto), marker=dict(size=4), name=nome))
+    fig.update_layout(xaxis_title=None, yaxis_title="€ Totali", showlegend=False, hovermode="x unified")
+    return fig
+
+@metriche.misurata("grafico:trono")
+def figura_trono(df_race, max_punti=MAX_PUNTI_GRAFICO):
+    tenuti = _riduci(df_race["Data"].to_numpy(), df_race["Profitto"].to_numpy(), max_punti)
+    x = df_race["Data"].to_numpy(dtype=object)[tenuti]
+    y = df_race["Profitto"].to_numpy(dtype=float)[tenuti]
+    leader = df_race["Leader"].astype(str).to_numpy()[tenuti]
+    unique_leaders = df_race["Leader"].astype(str).unique(); colors = px.colors.qualitative.Plotly
+    color_map = {player: colors[i % len(colors)] for i, player in enumerate(unique_leaders)}
+    fig = go.Figure()
+    # Una traccia per leader: il tratto prende il colore del leader al punto d'arrivo
+    for current_leader in unique_leaders:
+        maschera = leader[1:] == current_leader
+        if not maschera.any(): continue
+        xs, ys = _segmenti(x, y, maschera)
+        colore = color_map[current_leader]
+        fig.add_trace(go.Scatter(x=xs, y=ys, mode='lines+markers', line=dict(color=colore, width=4), marker=dict(size=8, color=colore), name=current_leader, legendgroup=current_leader, showlegend=False, hovertemplate=f"<b>{current_leader}</b><br>Record: €%{{y:.0f}}<extra></extra>"))
+    for leader_nome in unique_leaders: fig.add_trace(go.Scatter(x=[None], y=[None], mode='markers', marker=dict(size=10, color=color_map[leader_nome]), name=leader_nome, legendgroup=leader_nome, showlegend=True))
+    fig.update_layout(xaxis_title=None, yaxis_title="Profitto Record (€)", hovermode="closest")
+    return fig
+
+@metriche.misurata("grafico:polso")
+def figura_polso(daily_stats):
+    fig_combo = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_combo.add_trace(go.Bar(x=daily_stats.index, y=daily_stats["Players"], name="N° Giocatori", marker_color="#636EFA", opacity=0.5), secondary_y=False)
+    fig_combo.add_trace(go.Scatter(x=daily_stats.index, y=daily_stats["Pot"], name="Pot (€)", mode='lines+markers', line=dict(color="#00CC96", width=3)), secondary_y=True)
+    fig_combo.update_layout(hovermode="x unified", showlegend=False)
+    fig_combo.update_yaxes(title_text="N° Giocatori", secondary_y=False, showgrid=False)
+    fig_combo.update_yaxes(title_text="Pot (€)", secondary_y=True, showgrid=True)
+    return fig_combo
+
+@metriche.misurata("grafico:proiezione")
+def figura_proiezione(bande):
+    # bande: percentili del bankroll simulato per sessione futura (simulazione.simula)
+    x = bande.index.to_numpy()
+    fig = go.Figure()
+    for basso, alto, opacita, nome in [("P5", "P95", 0.15, "90%"), ("P25", "P75", 0.3, "50%")]:
+        fig.add_trace(go.Scatter(x=x, y=bande[alto], mode='lines', line=dict(width=0), hoverinfo='skip', showlegend=False))
+        fig.add_trace(go.Scatter(x=x, y=bande[basso], mode='lines', line=dict(width=0), fill='tonexty', fillcolor=f"rgba(99, 110, 250, {opacita})", name=f"Banda {nome}", hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=x, y=bande["P50"], mode='lines', line=dict(color="#636EFA", width=3), name="Mediana", hovertemplate="Sessione %{x}<br>€ %{y:.0f}<extra></extra>"))
+    fig.add_hline(y=0, line_dash="dash", line_color="white")
+    fig.update_layout(xaxis_title="Sessioni future", yaxis_title="€ rispetto a oggi", hovermode="x unified")
+    return fig
+
+@metriche.misurata("grafico:forma")
+def figura_forma(df_forma, metrica, titolo, max_punti=MAX_PUNTI_GRAFICO):
+    # df_forma: statistiche.forma(); una sola traccia, ridotta con LTTB come il bankroll
+    tenuti = _riduci(df_forma["Data"].to_numpy(), df_forma[metrica].to_numpy(), max_punti)
+    x = df_forma["Data"].to_numpy(dtype=object)[tenuti]
+    y = df_forma[metrica].to_numpy(dtype=float)[tenuti]
+    fig = go.Figure(go.Scatter(x=x, y=y, mode='lines', line=dict(color="#636EFA", width=3), name=titolo, hovertemplate=f"%{{x|%d/%m/%Y}}<br>{titolo}: %{{y:.1f}}<extra></extra>"))
+    if metrica in ("Profitto", "ROI"): fig.add_hline(y=0, line_dash="dash", line_color="white")
+    fig.update_layout(xaxis_title=None, yaxis_title=titolo, showlegend=False, hovermode="x unified")
+    return fig
+
+@metriche.misurata("grafico:matrice")
+def figura_matrice(matrice, titolo, divergente=False):
+    # matrice: DataFrame giocatore x avversario (statistiche.testa_a_testa); NaN = mai insieme
+    valori = matrice.to_numpy(dtype=float)
+    estremo = np.nanmax(np.abs(valori)) if divergente and np.isfinite(valori).any() else None
+    fig = go.Figure(go.Heatmap(
+        z=valori, x=list(matrice.columns), y=list(matrice.index), colorscale="RdYlGn" if divergente else "Blues",
+        zmid=0 if divergente else None, zmin=-estremo if estremo else None, zmax=estremo, colorbar=dict(title=titolo),
+        hovertemplate=f"%{{y}} con %{{x}}<br>{titolo}: %{{z:.1f}}<extra></extra>",
+    ))
+    fig.update_layout(xaxis_title="Avversario", yaxis_title=None, yaxis_autorange="reversed", height=max(400, 18 * len(matrice) + 150))
+    return fig
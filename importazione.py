@@ -0,0 +1,245 @@
+import hashlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+import gspread
+import openpyxl
+import pandas as pd
+import requests
+
+# --- LETTURA A BLOCCHI ---
+# Il file viene letto e pulito a blocchi di DIMENSIONE_BLOCCO righe: la memoria di picco
+# dipende dal blocco e non dalla lunghezza dello storico. La pulizia è vettoriale.
+
+DIMENSIONE_BLOCCO = 20_000
+
+def _blocchi_excel(file, dimensione):
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        righe = wb.worksheets[0].iter_rows(values_only=True)
+        header = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(next(righe, ()))]
+        while True:
+            blocco = list(itertools.islice(righe, dimensione))
+            if not blocco: break
+            yield pd.DataFrame(blocco, columns=header)
+    finally:
+        wb.close()
+
+def leggi_a_blocchi(file, nome, dimensione=DIMENSIONE_BLOCCO):
+    # NON usiamo dtype=str per tutto: lasciamo che Pandas capisca le date da solo
+    if nome.endswith('.csv'):
+        yield from pd.read_csv(file, chunksize=dimensione)
+    else:
+        yield from _blocchi_excel(file, dimensione)
+
+def normalizza_colonne(df):
+    df.columns = [str(c).strip() for c in df.columns]
+    cols_lower = {c.lower(): c for c in df.columns}
+    rename_map = {}
+    if "nome del giocatore" in cols_lower: rename_map[cols_lower["nome del giocatore"]] = "Giocatore"
+    elif "giocatore" in cols_lower: rename_map[cols_lower["giocatore"]] = "Giocatore"
+    if "entrata" in cols_lower: rename_map[cols_lower["entrata"]] = "BuyIn"
+    elif "buyin" in cols_lower: rename_map[cols_lower["buyin"]] = "BuyIn"
+    for col in cols_lower:
+        if "uscita" in col or "cashout" in col:
+            rename_map[cols_lower[col]] = "CashOut"
+            break
+    if "data" in cols_lower: rename_map[cols_lower["data"]] = "Data"
+    return df.rename(columns=rename_map)
+
+def numeri_italiani(serie):
+    # Come prima: il "-" è un segnaposto e diventa "0", quindi il segno non viene mai letto
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float).fillna(0.0).abs()
+    s = serie.astype(str).str.strip()
+    # Celle vuote: a seconda della versione di pandas astype(str) le lascia NaN o le scrive
+    vuoti = serie.isna() | s.isin(["nan", "None", "NaT", ""])
+    s = s.str.replace("€", "", regex=False).str.strip().str.replace("-", "0", regex=False)
+    # Se c'è la virgola è un decimale italiano (17,50): via i punti delle migliaia
+    virgola = s.str.contains(",", regex=False)
+    s = s.where(~virgola, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(s.mask(vuoti, "0"), errors="raise").astype(float)
+
+def pulisci_blocco(df):
+    # Restituisce il blocco pulito e il numero di righe scartate per data non valida
+    df = normalizza_colonne(df)
+    for col in ["BuyIn", "CashOut"]:
+        df[col] = numeri_italiani(df[col])
+    df["Profitto"] = df["CashOut"] - df["BuyIn"]
+    df["Data"] = pd.to_datetime(df["Data"], dayfirst=True, errors='coerce')
+    righe_totali = len(df)
+    df = df.dropna(subset=["Data"])
+    # Stringa YYYY-MM-DD per Google Sheets
+    df["Data"] = df["Data"].dt.strftime('%Y-%m-%d')
+    return df, righe_totali - len(df)
+
+def righe_da_frame(df, club_name):
+    # Serializzazione per colonne, senza iterrows
+    colonne = [df["Data"].astype(str).tolist(), df["Giocatore"].tolist()]
+    colonne += [df[c].astype(float).tolist() for c in ["BuyIn", "CashOut", "Profitto"]]
+    return [[*r, club_name] for r in zip(*colonne)]
+
+def analizza_file(file, nome, club_name, filtro, righe_anteprima=5):
+    # Primo passaggio: conta righe valide, scartate e già presenti e tiene solo l'anteprima
+    valide, scartate, presenti, anteprima = 0, 0, 0, None
+    for blocco in leggi_a_blocchi(file, nome):
+        pulito, perse = pulisci_blocco(blocco)
+        valide += len(pulito); scartate += perse
+        presenti += sum(not filtro(r) for r in righe_da_frame(pulito, club_name))
+        if anteprima is None and not pulito.empty: anteprima = pulito.head(righe_anteprima)
+    return valide, scartate, presenti, anteprima if anteprima is not None else pd.DataFrame()
+
+def righe_file(file, nome, club_name):
+    for blocco in leggi_a_blocchi(file, nome):
+        pulito, _ = pulisci_blocco(blocco)
+        yield from righe_da_frame(pulito, club_name)
+
+def firma_importazione(club_name, contenuto):
+    return hashlib.sha1(club_name.encode() + b"\0" + contenuto).hexdigest()
+
+# --- LIMITATORE DI RICHIESTE (token bucket adattivo) ---
+# Il ritmo parte da RITMO_INIZIALE richieste/s, sale piano a ogni successo e si dimezza
+# a ogni errore di quota (429): le importazioni vanno veloci finché c'è margine.
+
+RITMO_INIZIALE = 1.0
+RITMO_MIN = 0.1
+RITMO_MAX = 5.0
+
+class TokenBucket:
+    def __init__(self, ritmo=RITMO_INIZIALE, capacita=5, ritmo_min=RITMO_MIN, ritmo_max=RITMO_MAX):
+        self.ritmo = ritmo
+        self.capacita = capacita
+        self.ritmo_min = ritmo_min
+        self.ritmo_max = ritmo_max
+        self._token = float(capacita)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def prendi(self):
+        while True:
+            with self._lock:
+                adesso = time.monotonic()
+                self._token = min(self.capacita, self._token + (adesso - self._ultimo) * self.ritmo)
+                self._ultimo = adesso
+                if self._token >= 1:
+                    self._token -= 1
+                    return
+                attesa = (1 - self._token) / self.ritmo
+            time.sleep(attesa)
+
+    def successo(self):
+        with self._lock:
+            self.ritmo = min(self.ritmo_max, self.ritmo + 0.1)
+
+    def rallenta(self):
+        with self._lock:
+            self.ritmo = max(self.ritmo_min, self.ritmo / 2)
+            self._token = 0.0
+
+# --- RETRY ---
+CODICI_RIPETIBILI = {429, 500, 502, 503, 504}
+
+def errore_ripetibile(e):
+    if isinstance(e, gspread.exceptions.APIError): return e.code in CODICI_RIPETIBILI
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+def errore_quota(e):
+    return isinstance(e, gspread.exceptions.APIError) and e.code == 429
+
+def attesa_backoff(tentativo, base=1.0, massimo=60.0):
+    # Exponential backoff con jitter, per non ripartire tutti insieme
+    return min(massimo, base * 2 ** tentativo) * random.uniform(0.5, 1.0)
+
+# --- IMPORTAZIONE RIPRENDIBILE ---
+# Le righe vanno su a lotti di dimensione adattiva (raddoppia dopo un successo, si
+# dimezza dopo un errore). Dopo ogni lotto confermato il checkpoint su disco registra
+# quante righe sono state scritte: rilanciando la stessa importazione si riparte da lì.
+# Se un append fallisce senza risposta, prima di riprovare si controlla se le righe
+# sono comunque arrivate sul foglio, così il lotto non viene duplicato.
+
+CARTELLA_CHECKPOINT = ".import_checkpoints"
+
+class ImportazioneRiprendibile:
+    # righe può essere una lista o un iteratore (lettura a blocchi): ne servono solo
+    # il totale per la barra di avanzamento e una firma stabile per il checkpoint.
+    # filtro (opzionale) vede tutte le righe in ordine, anche quelle saltate in ripresa,
+    # e decide quali scrivere: serve a scartare quelle già presenti sul foglio.
+    def __init__(self, ws, firma, righe, totale, limitatore, cartella=CARTELLA_CHECKPOINT,
+                 lotto=200, lotto_min=50, lotto_max=2000, tentativi=6, filtro=None):
+        self.ws = ws
+        self.righe = righe
+        self.totale = totale
+        self.filtro = filtro
+        self.saltate = 0
+        self.limitatore = limitatore
+        self.lotto, self.lotto_min, self.lotto_max = lotto, lotto_min, lotto_max
+        self.tentativi = tentativi
+        os.makedirs(cartella, exist_ok=True)
+        self.percorso = os.path.join(cartella, firma + ".json")
+        self.fatte = self._leggi_checkpoint()
+        self._righe_foglio = None
+
+    @property
+    def ripresa(self):
+        return self.fatte > 0
+
+    def _leggi_checkpoint(self):
+        try:
+            with open(self.percorso) as f: return int(json.load(f)["fatte"])
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def _salva_checkpoint(self):
+        tmp = self.percorso + ".tmp"
+        with open(tmp, "w") as f: json.dump({"fatte": self.fatte, "totale": self.totale}, f)
+        os.replace(tmp, self.percorso)
+
+    def esegui(self, progresso=None):
+        # Righe occupate sul foglio (header incluso): serve a verificare gli append incerti
+        self._righe_foglio = len(self.ws.col_values(1))
+        righe = iter(self.righe)
+        for riga in itertools.islice(righe, self.fatte):  # già scritte in un tentativo precedente
+            if self.filtro: self.filtro(riga)
+        while self.fatte < self.totale:
+            lotto = list(itertools.islice(righe, self.lotto))
+            if not lotto: break
+            da_scrivere = [r for r in lotto if self.filtro(r)] if self.filtro else lotto
+            try:
+                if da_scrivere: self._scrivi_lotto(da_scrivere)
+            except Exception:
+                self.lotto = max(self.lotto_min, self.lotto // 2)
+                raise
+            self.fatte += len(lotto)
+            self.saltate += len(lotto) - len(da_scrivere)
+            self._righe_foglio += len(da_scrivere)
+            self._salva_checkpoint()
+            self.lotto = min(self.lotto_max, self.lotto * 2)
+            if progresso: progresso(self.fatte, self.totale)
+        if os.path.exists(self.percorso): os.remove(self.percorso)
+
+    def _scrivi_lotto(self, lotto):
+        for tentativo in range(self.tentativi):
+            self.limitatore.prendi()
+            try:
+                self.ws.append_rows(lotto)
+                self.limitatore.successo()
+                return
+            except Exception as e:
+                if not errore_ripetibile(e) or tentativo == self.tentativi - 1: raise
+                if errore_quota(e): self.limitatore.rallenta()
+                time.sleep(attesa_backoff(tentativo))
+                if self._gia_scritto(lotto): return
+
+    def _gia_scritto(self, lotto):
+        inizio = self._righe_foglio + 1
+        try:
+            self.limitatore.prendi()
+            valori = self.ws.get(f"A{inizio}:B{inizio + len(lotto) - 1}")
+        except Exception:
+            return False
+        chiave = lambda r: [str(v) for v in r[:2]]
+        return len(valori) == len(lotto) and chiave(valori[0]) == chiave(lotto[0]) and chiave(valori[-1]) == chiave(lotto[-1])
@@ -0,0 +1,128 @@
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from logging.handlers import TimedRotatingFileHandler
+
+from gspread.http_client import HTTPClient
+
+# --- METRICHE ---
+# Misure di un rerun: tempo per fase, richieste HTTP a Google Sheets (numero, byte e
+# tempo) e hit/miss dei loader in cache. Le misure correnti sono per thread (un rerun
+# Streamlit gira in un solo thread); il lavoro di altri thread (flusher del diario, pool
+# dell'avvio) finisce in PROCESSO. A fine rerun il record va in FILE_METRICHE come riga
+# JSON; il file ruota a mezzanotte, così ogni file è un giorno di traffico.
+# POKER_METRICHE="" spegne la scrittura su file.
+
+FILE_METRICHE = os.environ.get("POKER_METRICHE", "metriche.jsonl")
+GIORNI_CONSERVATI = 14
+
+class Misure:
+    def __init__(self):
+        self.inizio = time.perf_counter()
+        self.fasi = defaultdict(lambda: [0.0, 0])         # secondi, volte
+        self.api = defaultdict(lambda: [0, 0, 0, 0.0])    # chiamate, byte inviati, byte ricevuti, secondi
+        self.cache = defaultdict(lambda: [0, 0])          # hit, miss
+        self._lock = threading.Lock()
+
+    def aggiungi_fase(self, nome, secondi):
+        with self._lock:
+            f = self.fasi[nome]; f[0] += secondi; f[1] += 1
+
+    def aggiungi_chiamata(self, tipo, inviati, ricevuti, secondi):
+        with self._lock:
+            a = self.api[tipo]; a[0] += 1; a[1] += inviati; a[2] += ricevuti; a[3] += secondi
+
+    def esito_cache(self, nome, hit):
+        with self._lock: self.cache[nome][0 if hit else 1] += 1
+
+    def durata(self):
+        return time.perf_counter() - self.inizio
+
+    def record(self, **extra):
+        with self._lock:
+            return {
+                "ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "durata": round(self.durata(), 4), **extra,
+                "fasi": {k: {"secondi": round(s, 4), "volte": n} for k, (s, n) in self.fasi.items()},
+                "api": {k: {"chiamate": c, "inviati": i, "ricevuti": r, "secondi": round(s, 4)} for k, (c, i, r, s) in self.api.items()},
+                "cache": {k: {"hit": h, "miss": m} for k, (h, m) in self.cache.items()},
+            }
+
+PROCESSO = Misure()
+_locale = threading.local()
+
+def inizia():
+    _locale.misure = Misure()
+    return _locale.misure
+
+def corrente():
+    return getattr(_locale, "misure", None) or PROCESSO
+
+def chiudi(misure, **extra):
+    # Scrive il record del rerun e stacca le misure dal thread
+    if getattr(_locale, "misure", None) is misure: _locale.misure = None
+    if FILE_METRICHE: _logger().info(json.dumps(misure.record(**extra), ensure_ascii=False))
+
+_lock_logger = threading.Lock()
+
+def _logger():
+    logger = logging.getLogger("poker.metriche")
+    with _lock_logger:
+        if not logger.handlers:
+            gestore = TimedRotatingFileHandler(FILE_METRICHE, when="midnight", backupCount=GIORNI_CONSERVATI, encoding="utf-8")
+            gestore.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(gestore)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+    return logger
+
+# --- FASI ---
+@contextmanager
+def fase(nome):
+    # I tempi sono inclusivi: una fase dentro un'altra conta in entrambe
+    misure, inizio = corrente(), time.perf_counter()
+    try:
+        yield
+    finally:
+        misure.aggiungi_fase(nome, time.perf_counter() - inizio)
+
+def misurata(nome=None):
+    def decoratore(func):
+        etichetta = nome or func.__name__
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with fase(etichetta): return func(*args, **kwargs)
+        return wrapper
+    return decoratore
+
+# --- RICHIESTE A SHEETS ---
+# Client HTTP di gspread che conta ogni richiesta, raggruppata per tipo
+# ("GET values", "POST values:append", "GET values:batchGet", ...)
+
+def tipo_richiesta(metodo, endpoint):
+    percorso = re.sub(r"^.*?/spreadsheets/[^/:?]+", "", endpoint.split("?")[0])
+    percorso = re.sub(r"/values/.*?(:append|:clear)?$", r"/values\1", percorso).strip("/:")
+    return f"{metodo.upper()} {percorso or 'spreadsheet'}"
+
+class HTTPClientMisurato(HTTPClient):
+    def request(self, method, endpoint, params=None, data=None, json=None, files=None, headers=None):
+        inizio = time.perf_counter()
+        risposta = None
+        try:
+            risposta = super().request(method, endpoint, params=params, data=data, json=json, files=files, headers=headers)
+            return risposta
+        except Exception as e:
+            risposta = getattr(e, "response", None)
+            raise
+        finally:
+            inviati = len(data or b"") + (len(_json_bytes(json)) if json is not None else 0)
+            ricevuti = len(risposta.content) if risposta is not None else 0
+            corrente().aggiungi_chiamata(tipo_richiesta(method, endpoint), inviati, ricevuti, time.perf_counter() - inizio)
+
+def _json_bytes(corpo):
+    return json.dumps(corpo, ensure_ascii=False).encode()
@@ -0,0 +1,110 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import grafici
+import statistiche
+from connessione import apri_archivio, apri_foglio
+
+# --- RAPPORTI SENZA INTERFACCIA ---
+# Lo stesso calcolo della pagina Statistiche (KPI e serie per giocatore, classifica,
+# trono, polso e salute del club), fuori da Streamlit e per più club insieme: ogni club
+# viene calcolato e scritto in HTML e/o JSON da un processo separato.
+#   python rapporti.py [CLUB ...] [--anno 2026 [--mese 2]] [--uscita rapporti] [--processi 4]
+# Senza club li fa tutti. Con POKER_BACKEND=locale usa i dati locali.
+
+CARTELLA_RAPPORTI = "rapporti"
+
+def rapporto_club(club_name, partite, anno=None, mese=None):
+    # partite: tabella canonica del club. None se nel periodo non ci sono partite
+    if partite.empty: return None
+    snap = statistiche.istantanea(statistiche.cubo_statico(partite), anno, mese)
+    if snap["partite"].empty: return None
+    return {"club": club_name, "anno": anno, "mese": mese, **snap}
+
+def _periodo(rapporto):
+    if rapporto["anno"] is None: return "Tutto lo Storico"
+    return f"{rapporto['mese']:02d}/{rapporto['anno']}" if rapporto["mese"] else str(rapporto["anno"])
+
+def _valore(v):
+    return v.item() if hasattr(v, "item") else v
+
+def rapporto_json(rapporto):
+    tabella = lambda df: json.loads(df.reset_index().to_json(orient="records", date_format="iso", force_ascii=False))
+    return {
+        "club": rapporto["club"], "periodo": _periodo(rapporto),
+        "salute": {k: [_valore(x) for x in v] if isinstance(v, tuple) else _valore(v) for k, v in rapporto["salute"].items()},
+        "giocatori": tabella(rapporto["riepilogo"]),
+        "classifica": tabella(rapporto["classifica"]),
+        "trono": tabella(rapporto["trono"].set_index("Data")),
+        "polso": tabella(rapporto["polso"]),
+    }
+
+def rapporto_html(rapporto):
+    salute = rapporto["salute"]
+    righe_salute = [
+        ("Sessioni", salute["Sessioni"]), ("Volume Totale", f"€ {salute['Volume']:.0f}"),
+        ("Pot Medio", f"€ {salute['PotMedio']:.0f}"), ("Partecipanti Medi", f"{salute['PartecipantiMedi']:.1f}"),
+        ("🦈 Top Shark", f"{salute['Shark'][0]} (€ {salute['Shark'][1]:.0f})"), ("🎯 Sniper", f"{salute['Sniper'][0]} (€ {salute['Sniper'][1]:.0f})"),
+    ]
+    grafico = lambda fig: fig.to_html(full_html=False, include_plotlyjs="cdn")
+    parti = [
+        f"<h1>♣️ {html.escape(rapporto['club'])}</h1><p>{_periodo(rapporto)}</p>",
+        "<h2>💰 Salute del Club</h2><table>" + "".join(f"<tr><th>{k}</th><td>{html.escape(str(v))}</td></tr>" for k, v in righe_salute) + "</table>",
+        "<h2>📋 Classifica Dettagliata</h2>" + rapporto["classifica"].to_html(float_format="{:.2f}".format),
+        "<h2>👤 Giocatori</h2>" + rapporto["riepilogo"].to_html(float_format="{:.2f}".format),
+        "<h2>⚔️ Il Trono</h2>" + (grafico(grafici.figura_trono(rapporto["trono"])) if not rapporto["trono"].empty else ""),
+        "<h2>💓 Il Polso del Club</h2>" + grafico(grafici.figura_polso(rapporto["polso"])),
+    ]
+    return f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(rapporto['club'])}</title></head><body>{''.join(parti)}</body></html>"
+
+def nome_file(club_name, anno=None, mese=None):
+    base = re.sub(r"[^\w.-]+", "_", club_name).strip("_") or "club"
+    periodo = "storico" if anno is None else f"{anno}-{mese:02d}" if mese else str(anno)
+    return f"{base}-{hashlib.sha1(club_name.encode()).hexdigest()[:6]}-{periodo}"
+
+def scrivi_rapporto(club_name, partite, anno, mese, cartella, formati):
+    # Lavoro di un processo del pool: restituisce (club, file scritti)
+    rapporto = rapporto_club(club_name, partite, anno, mese)
+    if rapporto is None: return club_name, []
+    base = os.path.join(cartella, nome_file(club_name, anno, mese))
+    scritti = []
+    if "json" in formati:
+        with open(base + ".json", "w", encoding="utf-8") as f: json.dump(rapporto_json(rapporto), f, ensure_ascii=False, indent=1)
+        scritti.append(base + ".json")
+    if "html" in formati:
+        with open(base + ".html", "w", encoding="utf-8") as f: f.write(rapporto_html(rapporto))
+        scritti.append(base + ".html")
+    return club_name, scritti
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rapporti statistici dei club, senza interfaccia.")
+    parser.add_argument("club", nargs="*", help="club da includere (default: tutti)")
+    parser.add_argument("--anno", type=int)
+    parser.add_argument("--mese", type=int, choices=range(1, 13))
+    parser.add_argument("--uscita", default=CARTELLA_RAPPORTI)
+    parser.add_argument("--processi", type=int, default=os.cpu_count())
+    parser.add_argument("--formato", nargs="+", choices=["html", "json"], default=["html", "json"])
+    args = parser.parse_args(argv)
+    if args.mese and args.anno is None: parser.error("--mese richiede --anno")
+
+    archivio = apri_archivio(apri_foglio())
+    archivio.avvia()
+    tutti = archivio.clubs().aggiorna().club
+    sconosciuti = [c for c in args.club if c not in tutti]
+    if sconosciuti: parser.error(f"club inesistenti: {', '.join(sconosciuti)}")
+    clubs = args.club or list(tutti)
+    os.makedirs(args.uscita, exist_ok=True)
+    # I dati si leggono qui (una connessione sola), i calcoli vanno in parallelo
+    with ProcessPoolExecutor(max_workers=args.processi) as pool:
+        lavori = [pool.submit(scrivi_rapporto, c, statistiche.tabella_partite(archivio.leggi_partite(c)), args.anno, args.mese, args.uscita, args.formato) for c in clubs]
+        for lavoro in lavori:
+            club_name, scritti = lavoro.result()
+            print(f"{club_name}: {', '.join(scritti) if scritti else 'nessuna partita nel periodo'}")
+
+if __name__ == "__main__":
+    main()
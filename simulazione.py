@@ -0,0 +1,69 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# --- SIMULAZIONE MONTE CARLO ---
+# Bootstrap dei risultati già giocati: ogni percorso pesca N sessioni (con reinserimento)
+# dai profitti del giocatore e le somma. Tutti i percorsi sono una sola matrice
+# percorsi x sessioni (float32), quindi decine di migliaia di percorsi restano sotto il
+# secondo. Dalla matrice escono le bande del bankroll, il profitto atteso e la
+# distribuzione dei drawdown e dei minimi, su cui soglia e bankroll sono solo ricerche.
+
+PERCORSI = 20000
+SESSIONI_FUTURE = 50
+MIN_SESSIONI = 5   # sotto, il bootstrap ripete sempre le stesse due o tre sessioni
+PERCENTILI = [5, 25, 50, 75, 95]
+
+def simula(profitti, sessioni=SESSIONI_FUTURE, percorsi=PERCORSI, seme=None):
+    # profitti: risultati in euro delle sessioni giocate. None se sono troppo pochi
+    profitti = np.asarray(profitti, dtype=np.float32)
+    if len(profitti) < MIN_SESSIONI or sessioni < 1: return None
+    rng = np.random.default_rng(seme)
+    percorso = profitti[rng.integers(0, len(profitti), size=(percorsi, sessioni))]
+    np.cumsum(percorso, axis=1, out=percorso)
+    # Il picco parte da 0 (bankroll di oggi): drawdown = massima discesa dal picco
+    picco = np.maximum.accumulate(np.maximum(percorso, 0), axis=1)
+    drawdown = (picco - percorso).max(axis=1)
+    minimi = np.minimum(percorso.min(axis=1), 0)
+    bande = pd.DataFrame(np.percentile(percorso, PERCENTILI, axis=0).T, columns=[f"P{p}" for p in PERCENTILI])
+    bande["Media"] = percorso.mean(axis=0)
+    bande = pd.concat([pd.DataFrame(0.0, index=[0], columns=bande.columns), bande], ignore_index=True).rename_axis("Sessione")
+    finali = percorso[:, -1]
+    return {
+        "bande": bande, "sessioni": sessioni, "percorsi": percorsi, "campione": len(profitti),
+        "atteso": float(finali.mean()), "positivo": float((finali > 0).mean() * 100),
+        "drawdown": np.sort(drawdown), "minimi": np.sort(minimi),
+    }
+
+def probabilita_drawdown(sim, soglia):
+    # % di percorsi che a un certo punto perdono almeno `soglia` € dal loro massimo
+    return float((len(sim["drawdown"]) - np.searchsorted(sim["drawdown"], soglia, "left")) / len(sim["drawdown"]) * 100)
+
+def rischio_rovina(sim, bankroll):
+    # % di percorsi che bruciano tutto il bankroll partendo da oggi
+    return float(np.searchsorted(sim["minimi"], -bankroll, "right") / len(sim["minimi"]) * 100)
+
+def _riga_giocatore(profitti, sessioni, percorsi, seme, soglia, bankroll):
+    sim = simula(profitti, sessioni, percorsi, seme)
+    if sim is None: return None
+    return {
+        "Campione": sim["campione"], "Atteso": sim["atteso"], "P5": sim["bande"]["P5"].iat[-1], "P95": sim["bande"]["P95"].iat[-1],
+        "InAttivo": sim["positivo"], "DrawdownMediano": float(np.median(sim["drawdown"])),
+        "ProbDrawdown": probabilita_drawdown(sim, soglia), "Rovina": rischio_rovina(sim, bankroll),
+    }
+
+def simula_club(partite, sessioni=SESSIONI_FUTURE, percorsi=PERCORSI, soglia=100, bankroll=200, seme=None, processi=None):
+    # partite: tabella canonica (importi in centesimi). Una riga per giocatore con almeno
+    # MIN_SESSIONI sessioni; con processi > 1 i giocatori vanno su un pool di processi
+    attive = partite[partite["BuyIn"] > 0]
+    gruppi = {g: p.to_numpy() / 100 for g, p in attive.groupby("Giocatore", observed=True)["Profitto"]}
+    semi = np.random.SeedSequence(seme).spawn(len(gruppi))
+    argomenti = [(p, sessioni, percorsi, s, soglia, bankroll) for p, s in zip(gruppi.values(), semi)]
+    if processi and processi > 1 and len(argomenti) > 1:
+        with ProcessPoolExecutor(max_workers=processi) as pool:
+            righe = list(pool.map(_riga_giocatore, *zip(*argomenti)))
+    else:
+        righe = [_riga_giocatore(*a) for a in argomenti]
+    out = pd.DataFrame([r for r in righe if r is not None], index=pd.Index([g for g, r in zip(gruppi, righe) if r is not None], name="Giocatore"))
+    return out.sort_values("Atteso", ascending=False) if not out.empty else out
@@ -0,0 +1,62 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# --- DATI SINTETICI ---
+# Stesso schema di games_log.csv (Club, Data, Giocatore, BuyIn, CashOut, Profitto) in
+# qualsiasi scala. Ogni club ha una rosa pescata dal pool di giocatori (chi gioca in più
+# club ci finisce più volte) e circa una serata a settimana (più fitte nei club più attivi); ogni membro ha la sua frequenza
+# di presenza, i buy-in sono tagli da 10 € e il piatto di ogni serata viene ridistribuito
+# tra i presenti, con vincitori pochi e grossi come al tavolo vero.
+#   python sintetici.py --righe 1000000 --giocatori 5000 --club 1000 --uscita games_log_grande.csv
+
+ROSA_MIN, ROSA_MAX = 6, 24
+INIZIO = np.datetime64("2018-01-01")
+GIORNI_MAX = 8 * 365
+
+def genera_partite(righe=100_000, giocatori=1_000, clubs=100, seme=0):
+    rng = np.random.default_rng(seme)
+    nomi_giocatori = np.array([f"Giocatore {i:05d}" for i in range(giocatori)])
+    nomi_club = np.array([f"Club {i:04d}" for i in range(clubs)])
+    rose = [rng.choice(giocatori, min(giocatori, int(rng.integers(ROSA_MIN, ROSA_MAX + 1))), replace=False) for _ in range(clubs)]
+    presenze = [rng.beta(2, 2, len(r)) for r in rose]
+    # Club più e meno attivi (lognormale); il totale atteso delle righe è circa `righe`
+    attese = np.array([p.sum() for p in presenze])
+    attivita = rng.lognormal(0, 0.8, clubs)
+    serate = np.maximum(1, np.round(righe * attivita / (attivita * attese).sum()).astype(int))
+    primo = np.concatenate([[0], np.cumsum(serate)[:-1]])
+    blocchi = []
+    for k in range(clubs):
+        presenti = rng.random((serate[k], len(rose[k]))) < presenze[k]
+        presenti[presenti.sum(axis=1) < 2, :2] = True  # almeno due al tavolo
+        serata, posto = np.nonzero(presenti)
+        finestra = max(serate[k], min(7 * serate[k], GIORNI_MAX))
+        giorni = np.sort(rng.choice(finestra, serate[k], replace=False))
+        date = INIZIO + rng.integers(0, 365) + giorni[serata]
+        blocchi.append((np.full(len(serata), k), date, rose[k][posto], primo[k] + serata))
+    club, date, giocatore, sessione = (np.concatenate(c) for c in zip(*blocchi))
+
+    buyin = 10.0 * rng.choice([1, 2, 2, 2, 3, 4, 5], len(club)) * rng.choice([1, 1, 1, 2], len(club))  # qualche rebuy
+    piatto = np.bincount(sessione, weights=buyin)
+    quote = rng.gamma(0.6, size=len(club))
+    cashout = np.round(piatto[sessione] * quote / np.bincount(sessione, weights=quote)[sessione] / 5) * 5
+    return pd.DataFrame({
+        "Club": nomi_club[club], "Data": pd.to_datetime(date).strftime("%Y-%m-%d"), "Giocatore": nomi_giocatori[giocatore],
+        "BuyIn": buyin, "CashOut": cashout, "Profitto": cashout - buyin,
+    })
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera partite sintetiche nello schema di games_log.csv.")
+    parser.add_argument("--righe", type=int, default=100_000)
+    parser.add_argument("--giocatori", type=int, default=1_000)
+    parser.add_argument("--club", type=int, default=100)
+    parser.add_argument("--seme", type=int, default=0)
+    parser.add_argument("--uscita", default="games_log_sintetico.csv")
+    args = parser.parse_args(argv)
+    df = genera_partite(args.righe, args.giocatori, args.club, args.seme)
+    df.to_csv(args.uscita, index=False)
+    print(f"{args.uscita}: {len(df)} righe, {df['Giocatore'].nunique()} giocatori, {df['Club'].nunique()} club")
+
+if __name__ == "__main__":
+    main()
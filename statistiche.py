@@ -0,0 +1,428 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# --- SCHEMA DELLE PARTITE ---
+# Forma canonica della tabella partite, applicata una sola volta quando i dati entrano in
+# cache: Data datetime64, Giocatore e Club categoriali, importi in centesimi interi (int64).
+# I calcoli lavorano in centesimi, quindi somme e controlli a somma zero sono esatti;
+# gli importi tornano in euro solo nei risultati.
+
+COLONNE_PARTITE = ["Data", "Giocatore", "BuyIn", "CashOut", "Profitto", "Club"]
+IMPORTI = ["BuyIn", "CashOut", "Profitto"]
+
+def centesimi(serie):
+    return (pd.to_numeric(serie, errors='coerce').fillna(0) * 100).round().astype("int64")
+
+def in_euro(df):
+    # Copia con gli importi in euro, per tabelle e grafici
+    return df.assign(**{c: df[c] / 100 for c in IMPORTI if c in df})
+
+def tabella_partite(df):
+    if df.empty: return pd.DataFrame()
+    # ISO8601: il foglio mescola "2025-01-03 00:00:00" (storico migrato) e "2026-01-01"
+    # (sessioni salvate dall'app); col formato dedotto dalla prima riga le altre diventano NaT
+    out = pd.DataFrame({"Data": pd.to_datetime(df["Data"], errors='coerce', format="ISO8601")})
+    out["Giocatore"] = df["Giocatore"].astype(str)
+    for col in IMPORTI:
+        out[col] = centesimi(df[col])
+    out["Club"] = df["Club"].astype(str) if "Club" in df else ""
+    out = out.dropna(subset=["Data"]).reset_index(drop=True)
+    out["Giocatore"] = out["Giocatore"].astype("category")
+    out["Club"] = out["Club"].astype("category")
+    return out
+
+# --- MOTORE STATISTICHE ---
+# KPI e serie (streak) di tutti i giocatori di un club in un solo passaggio vettoriale.
+# Lavora sulla tabella canonica (importi in centesimi) e restituisce importi in euro.
+# Le serie si ottengono con run-length encoding sul frame ordinato per giocatore e data:
+# una "serie" è una sequenza di sessioni consecutive con profitto dello stesso segno,
+# interrotta da un pareggio, da un cambio di segno o dal cambio di giocatore.
+
+COLONNE_SERIE = [
+    "StreakAttuale",
+    "MaxSerieVinte", "SoldiMaxSerieVinte", "MigliorSerieSoldi", "SessMigliorSerieSoldi",
+    "MaxSeriePerse", "SoldiMaxSeriePerse", "PeggiorSerieSoldi", "SessPeggiorSerieSoldi",
+]
+
+def _prima_per_giocatore(serie, colonna, crescente, chiavi):
+    # A parità vince la serie più vecchia, come nel vecchio calcolo a ciclo
+    ordinate = serie.sort_values(colonna, ascending=crescente, kind="stable")
+    return ordinate.drop_duplicates(chiavi).set_index(chiavi)
+
+def calcola_serie(df_active, chiavi=("Giocatore",)):
+    # df_active: solo sessioni giocate (BuyIn > 0), ordinate per chiavi e data.
+    # chiavi=("Club", "Giocatore") dà le serie di ogni giocatore dentro ogni club
+    chiavi = list(chiavi)
+    if df_active.empty:
+        return pd.DataFrame(columns=chiavi + COLONNE_SERIE).set_index(chiavi)
+    profitti = df_active["Profitto"].to_numpy(dtype=float)
+    segno = np.sign(profitti)
+    inizio = np.ones(len(profitti), dtype=bool)
+    inizio[1:] = segno[1:] != segno[:-1]
+    for c in chiavi:
+        v = df_active[c].to_numpy()
+        inizio[1:] |= v[1:] != v[:-1]
+    run = pd.DataFrame({**{c: df_active[c].to_numpy() for c in chiavi}, "Segno": segno, "Profitto": profitti, "Run": np.cumsum(inizio)})
+    serie = run.groupby("Run", sort=True).agg(**{c: (c, "first") for c in chiavi}, Segno=("Segno", "first"), N=("Profitto", "size"), Somma=("Profitto", "sum")).reset_index()
+
+    ultima = serie.drop_duplicates(chiavi, keep="last").set_index(chiavi)
+    out = pd.DataFrame(index=serie.drop_duplicates(chiavi).set_index(chiavi).index)
+    out["StreakAttuale"] = (ultima["Segno"] * ultima["N"]).astype(int)
+
+    vinte, perse = serie[serie["Segno"] > 0], serie[serie["Segno"] < 0]
+    lunga_v = _prima_per_giocatore(vinte, "N", False, chiavi)
+    ricca_v = _prima_per_giocatore(vinte, "Somma", False, chiavi)
+    lunga_p = _prima_per_giocatore(perse, "N", False, chiavi)
+    povera_p = _prima_per_giocatore(perse, "Somma", True, chiavi)
+    out["MaxSerieVinte"], out["SoldiMaxSerieVinte"] = lunga_v["N"], lunga_v["Somma"]
+    out["MigliorSerieSoldi"], out["SessMigliorSerieSoldi"] = ricca_v["Somma"], ricca_v["N"]
+    out["MaxSeriePerse"], out["SoldiMaxSeriePerse"] = lunga_p["N"], lunga_p["Somma"]
+    out["PeggiorSerieSoldi"], out["SessPeggiorSerieSoldi"] = povera_p["Somma"], povera_p["N"]
+    return out.fillna(0)
+
+def riepilogo_giocatori(df, chiavi=("Giocatore",)):
+    # df: partite già pulite (Data datetime, importi numerici) del periodo scelto.
+    # Restituisce una riga per giocatore (o per club e giocatore): scegliere diventa un lookup.
+    chiavi = list(chiavi)
+    df = df.sort_values(chiavi + ["Data"], kind="stable")
+    attive = df[df["BuyIn"] > 0]
+    p = attive["Profitto"]
+    kpi = attive.assign(Vinta=p > 0, Persa=p < 0, ProfVinta=p.where(p > 0), ProfPersa=p.where(p < 0)).groupby(chiavi, observed=True).agg(
+        Volume=("BuyIn", "sum"), Sessioni=("Profitto", "size"),
+        MaxVincita=("Profitto", "max"), MaxPerdita=("Profitto", "min"),
+        MediaVincita=("ProfVinta", "mean"), MediaPerdita=("ProfPersa", "mean"),
+        Vittorie=("Vinta", "sum"), Sconfitte=("Persa", "sum"), Volatilita=("Profitto", "std"),
+    )
+    out = df.groupby(chiavi, observed=True)["Profitto"].sum().to_frame("Bilancio").join(kpi).join(calcola_serie(attive, chiavi))
+    out = out.fillna(0)
+    conteggi = ["Sessioni", "Vittorie", "Sconfitte", "StreakAttuale", "MaxSerieVinte", "SessMigliorSerieSoldi", "MaxSeriePerse", "SessPeggiorSerieSoldi"]
+    out[conteggi] = out[conteggi].astype(int)
+    soldi = ["Bilancio", "Volume", "MaxVincita", "MaxPerdita", "MediaVincita", "MediaPerdita", "Volatilita",
+             "SoldiMaxSerieVinte", "MigliorSerieSoldi", "SoldiMaxSeriePerse", "PeggiorSerieSoldi"]
+    out[soldi] = out[soldi] / 100
+
+    if len(chiavi) > 1:
+        sessioni = df.groupby(chiavi[:-1], observed=True)["Data"].nunique()
+        out["SessioniClub"] = sessioni.reindex(out.index.droplevel(-1)).to_numpy()
+    else:
+        out["SessioniClub"] = df["Data"].nunique()
+    out["Presenze"] = np.where(out["SessioniClub"] > 0, out["Sessioni"] / out["SessioniClub"].clip(lower=1) * 100, 0.0)
+    out["ROI"] = np.where(out["Volume"] > 0, out["Bilancio"] / out["Volume"].where(out["Volume"] > 0) * 100, 0.0)
+    out["WinRate"] = np.where(out["Sessioni"] > 0, out["Vittorie"] / out["Sessioni"].clip(lower=1) * 100, 0.0)
+    return out
+
+# --- ISTANTANEA DEL CLUB ---
+# Tabelle derivate (classifica, trono, polso, riepiloghi) calcolate una volta per
+# versione dei dati del club e periodo: l'app le mette in cache e tutti i membri
+# che guardano lo stesso club condividono lo stesso calcolo. Classifica e salute
+# si leggono dal cubo anno/mese (sotto), senza riscandire le righe.
+
+def filtra_periodo(df, anno=None, mese=None):
+    if anno is not None: df = df[df["Data"].dt.year == anno]
+    if mese is not None: df = df[df["Data"].dt.month == mese]
+    return df
+
+def periodi(mesi):
+    # {anno: [mesi con almeno una partita]}, letto dal cubo
+    if mesi.empty: return {}
+    chiavi = mesi.index.droplevel("Club").unique()
+    return {int(a): sorted(int(m) for m in chiavi[chiavi.get_level_values("Anno") == a].get_level_values("Mese")) for a in chiavi.get_level_values("Anno").unique()}
+
+def classifica(celle):
+    stats = celle.groupby(level="Giocatore", observed=True)[["Sessioni", "BuyIn", "Profitto"]].sum()
+    stats = in_euro(stats).rename(columns={"BuyIn": "Volume (€)"})
+    stats["ROI %"] = (stats["Profitto"] / stats["Volume (€)"] * 100).round(1).fillna(0.0)
+    return stats[["Sessioni", "Volume (€)", "Profitto", "ROI %"]].sort_values("Profitto", ascending=False)
+
+def corsa_al_trono(df):
+    # Leader del profitto cumulato sessione per sessione, con un punto zero iniziale
+    df_cumsum = df.pivot_table(index="Data", columns="Giocatore", values="Profitto", aggfunc="sum", observed=True).fillna(0).cumsum() / 100
+    if df_cumsum.empty: return pd.DataFrame(columns=["Data", "Leader", "Profitto"])
+    df_race = pd.DataFrame({"Leader": df_cumsum.idxmax(axis=1), "Profitto": df_cumsum.max(axis=1)}).reset_index().sort_values("Data")
+    row_zero = pd.DataFrame({"Data": [df_race["Data"].min() - pd.Timedelta(days=1)], "Leader": [df_race.iloc[0]["Leader"]], "Profitto": [0]})
+    return pd.concat([row_zero, df_race]).sort_values("Data").reset_index(drop=True)
+
+def polso_club(df):
+    polso = df.groupby("Data").agg(Players=("Giocatore", "count"), Pot=("BuyIn", "sum")).sort_index()
+    polso["Pot"] = polso["Pot"] / 100
+    return polso
+
+def salute_club(celle, mesi):
+    num_sessions = int(mesi["Sessioni"].sum())
+    volume = mesi["BuyIn"].sum() / 100
+    profitti = celle.groupby(level="Giocatore", observed=True)["Profitto"].sum() / 100
+    salute = {
+        "Sessioni": num_sessions, "Volume": volume,
+        "PotMedio": volume / num_sessions if num_sessions > 0 else 0,
+        "PartecipantiMedi": mesi["Righe"].sum() / num_sessions if num_sessions > 0 else 0,
+        "Shark": (profitti.idxmax(), profitti.max()) if not profitti.empty else ("-", 0),
+        "Sniper": ("-", 0),
+    }
+    if not celle.empty:
+        # A parità di vincita la prima riga della tabella, come nel calcolo riga per riga
+        pari = celle[celle["MaxProfitto"] == celle["MaxProfitto"].max()]
+        idx = pari["RigaMax"].idxmin()
+        salute["Sniper"] = (idx[celle.index.names.index("Giocatore")], celle.at[idx, "MaxProfitto"] / 100)
+    return salute
+
+def istantanea(cubo, anno=None, mese=None):
+    # cubo: il dizionario di CuboPartite.aggiorna(). Classifica, presenze e salute
+    # vengono dal cubo; riepilogo, trono e polso hanno bisogno delle singole righe.
+    df = filtra_periodo(cubo["partite"], anno, mese)
+    celle, mesi = filtra_cubo(cubo["giocatori"], anno, mese), filtra_cubo(cubo["mesi"], anno, mese)
+    return {
+        "partite": df,
+        "date": sorted(df["Data"].unique()),
+        "riepilogo": riepilogo_giocatori(df),
+        "classifica": classifica(celle),
+        "presenze": celle.groupby(level="Giocatore", observed=True)["Sessioni"].sum(),
+        "trono": corsa_al_trono(df),
+        "polso": polso_club(df),
+        "salute": salute_club(celle, mesi),
+        "periodi": periodi(mesi),
+    }
+
+# --- CUBO ANNO/MESE ---
+# Aggregati per (club, anno, mese, giocatore) e per (club, anno, mese): somme, conteggi,
+# estremi e sessioni distinte. Un mese appartiene a un solo anno e una data a un solo mese,
+# quindi classifiche e salute di qualsiasi periodo si ottengono sommando celle.
+# CuboPartite li tiene allineati allo specchio del foglio: le righe nuove vengono
+# convertite da sole e si ricalcolano solo i mesi che toccano.
+
+def _periodo(df):
+    return df["Data"].dt.year * 100 + df["Data"].dt.month
+
+def cubo_periodi(df):
+    if df.empty: return pd.DataFrame(), pd.DataFrame()
+    chiavi = [df["Club"], df["Data"].dt.year.rename("Anno"), df["Data"].dt.month.rename("Mese")]
+    giocatori = df.groupby(chiavi + [df["Giocatore"]], observed=True).agg(
+        Righe=("Profitto", "size"), Sessioni=("Data", "nunique"),
+        BuyIn=("BuyIn", "sum"), CashOut=("CashOut", "sum"), Profitto=("Profitto", "sum"),
+        MaxProfitto=("Profitto", "max"), MinProfitto=("Profitto", "min"),
+        RigaMax=("Profitto", "idxmax"),  # prima riga col massimo: a parità vince la più vecchia
+    )
+    mesi = df.groupby(chiavi, observed=True).agg(Righe=("Profitto", "size"), Sessioni=("Data", "nunique"), BuyIn=("BuyIn", "sum"))
+    return giocatori, mesi
+
+def filtra_cubo(cubo, anno=None, mese=None):
+    if cubo.empty: return cubo
+    if anno is not None: cubo = cubo[cubo.index.get_level_values("Anno") == anno]
+    if mese is not None: cubo = cubo[cubo.index.get_level_values("Mese") == mese]
+    return cubo
+
+def unisci_partite(tabelle):
+    # Concatena tabelle canoniche tenendo le colonne categoriali (categorie unite una volta sola)
+    tabelle = [t for t in tabelle if not t.empty]
+    if not tabelle: return pd.DataFrame()
+    if len(tabelle) == 1: return tabelle[0]
+    tabelle = [t.copy() for t in tabelle]
+    for col in ["Giocatore", "Club"]:
+        categorie = tabelle[0][col].cat.categories
+        for t in tabelle[1:]: categorie = categorie.union(t[col].cat.categories)
+        for t in tabelle: t[col] = t[col].cat.set_categories(categorie)
+    return pd.concat(tabelle, ignore_index=True)
+
+def accoda_partite(partite, nuove):
+    if partite.empty: return nuove
+    if nuove.empty: return partite
+    return unisci_partite([partite, nuove])
+
+def cubo_statico(partite):
+    # Stesso dizionario di CuboPartite.aggiorna(), da una tabella canonica già pronta
+    giocatori, mesi = cubo_periodi(partite)
+    return {"partite": partite, "giocatori": giocatori, "mesi": mesi, "storico": indice_date(partite), "progressivi": progressivi_giocatori(partite)}
+
+class CuboPartite:
+    def __init__(self, specchio):
+        self.specchio = specchio
+        self.partite = pd.DataFrame()
+        self.giocatori, self.mesi = pd.DataFrame(), pd.DataFrame()
+        self.storico = indice_date(self.partite)
+        self.progressivi = {}
+        self._generazione = None
+        self._viste = 0
+        self._lock = threading.Lock()
+
+    def aggiorna(self):
+        self.specchio.aggiorna()
+        return self.attuale()
+
+    def versione(self):
+        # (generazione, righe) dello specchio: cambia quando attuale() ha qualcosa di nuovo
+        generazione, df = self.specchio.dati()
+        return generazione, len(df)
+
+    def attuale(self):
+        # Come aggiorna, ma con le sole righe già nello specchio: nessuna lettura da Sheets
+        generazione, df = self.specchio.dati()
+        with self._lock:
+            if self._generazione is None or generazione > self._generazione:
+                self.partite = tabella_partite(df)
+                self.giocatori, self.mesi = cubo_periodi(self.partite)
+                self.storico = indice_date(self.partite)
+                self.progressivi = progressivi_giocatori(self.partite)
+                self._generazione, self._viste = generazione, len(df)
+            elif generazione == self._generazione and len(df) > self._viste:
+                self._accoda(tabella_partite(df.iloc[self._viste:]))
+                self._viste = len(df)
+            return {"partite": self.partite, "giocatori": self.giocatori, "mesi": self.mesi, "storico": self.storico, "progressivi": self.progressivi}
+
+    def _accoda(self, nuove):
+        if nuove.empty: return
+        self.partite = accoda_partite(self.partite, nuove)
+        self.storico = indice_date(self.partite, self.storico)
+        self.progressivi = accoda_progressivi(self.progressivi, nuove, self.partite)
+        toccati = _periodo(nuove).unique()
+        giocatori, mesi = cubo_periodi(self.partite[_periodo(self.partite).isin(toccati)])
+        def resto(cubo):
+            if cubo.empty: return cubo
+            periodo = cubo.index.get_level_values("Anno") * 100 + cubo.index.get_level_values("Mese")
+            return cubo[~periodo.isin(toccati)]
+        self.giocatori = pd.concat([resto(self.giocatori), giocatori]).sort_index()
+        self.mesi = pd.concat([resto(self.mesi), mesi]).sort_index()
+
+# --- CLASSIFICA GLOBALE ---
+# Tutti i club insieme: le tabelle canoniche (già tenute aggiornate dai CuboPartite) si
+# uniscono una volta sola e lo stesso motore vettoriale raggruppa per giocatore e per
+# club e giocatore. Niente riletture del foglio per club.
+
+def classifica_globale(tabelle):
+    # tabelle: tabelle canoniche dei club -> (totale per giocatore, dettaglio per club e giocatore)
+    partite = unisci_partite(tabelle)
+    if partite.empty: return pd.DataFrame(), pd.DataFrame()
+    per_club = riepilogo_giocatori(partite, ["Club", "Giocatore"])
+    totale = riepilogo_giocatori(partite).drop(columns=["SessioniClub", "Presenze"])
+    totale["Club"] = per_club.groupby(level="Giocatore", observed=True).size()
+    return totale.sort_values("Bilancio", ascending=False), per_club
+
+# --- FORMA (finestre mobili) ---
+# Per ogni giocatore, somme progressive delle sue sessioni giocate in ordine di data:
+# numero, profitto, buy-in, vittorie e quadrati dei profitti. La somma su una finestra
+# (ultime N sessioni o ultimi N giorni) è la differenza di due progressivi, quindi tutta
+# la curva di forma costa O(n) qualunque sia la finestra. Il CuboPartite accoda le
+# sessioni nuove ai progressivi del giocatore senza ricalcolare gli altri.
+
+COLONNE_PROGRESSIVI = ["N", "Profitto", "BuyIn", "Vinte", "Quadrati"]
+
+def progressivi_giocatori(partite):
+    # {giocatore: (date, cumulati)}: cumulati è una matrice sessioni x COLONNE_PROGRESSIVI.
+    # Un solo cumsum su tutta la tabella ordinata per giocatore e data, poi a ogni
+    # giocatore si toglie il totale dei giocatori prima di lui (valori interi, esatti)
+    attive = partite[partite["BuyIn"] > 0] if not partite.empty else partite
+    if attive.empty: return {}
+    codici, date = attive["Giocatore"].cat.codes.to_numpy(), attive["Data"].to_numpy()
+    ordine = np.lexsort((date, codici))
+    codici, date = codici[ordine], date[ordine]
+    p = attive["Profitto"].to_numpy()[ordine].astype(float)
+    cumulati = np.cumsum(np.column_stack([np.ones_like(p), p, attive["BuyIn"].to_numpy()[ordine], p > 0, p * p]).astype(float), axis=0)
+    confini = np.flatnonzero(codici[1:] != codici[:-1]) + 1
+    precedenti = np.vstack([np.zeros(len(COLONNE_PROGRESSIVI)), cumulati[confini - 1]])
+    cumulati -= np.repeat(precedenti, np.diff(np.concatenate([[0], confini, [len(p)]])), axis=0)
+    nomi = attive["Giocatore"].cat.categories[codici[np.concatenate([[0], confini])]]
+    return dict(zip(nomi, zip(np.split(date, confini), np.split(cumulati, confini))))
+
+def accoda_progressivi(progressivi, nuove, partite):
+    # Copia aggiornata: chi legge la versione precedente non la vede cambiare
+    progressivi = dict(progressivi)
+    for g, (date, cumulati) in progressivi_giocatori(nuove).items():
+        vecchi = progressivi.get(g)
+        if vecchi is None:
+            progressivi[g] = (date, cumulati)
+        elif date[0] >= vecchi[0][-1]:
+            progressivi[g] = (np.concatenate([vecchi[0], date]), np.vstack([vecchi[1], cumulati + vecchi[1][-1]]))
+        else:
+            # Sessione retrodatata: si ricalcola solo questo giocatore
+            progressivi[g] = progressivi_giocatori(partite[partite["Giocatore"] == g])[g]
+    return progressivi
+
+def forma(progressivi, sessioni=None, giorni=None):
+    # Una riga per sessione: metriche sulla finestra che finisce in quella sessione
+    # (le ultime `sessioni` sessioni, oppure quelle degli ultimi `giorni` giorni)
+    date, cumulati = progressivi
+    cumulati = np.vstack([np.zeros(len(COLONNE_PROGRESSIVI)), cumulati])
+    fine = np.arange(1, len(date) + 1)
+    if sessioni:
+        inizio = np.maximum(fine - sessioni, 0)
+    else:
+        inizio = np.searchsorted(date, date - np.timedelta64(giorni, "D"), "right")
+    n, profitto, buyin, vinte, quadrati = (cumulati[fine] - cumulati[inizio]).T
+    varianza = np.where(n > 1, (quadrati - profitto ** 2 / n) / np.maximum(n - 1, 1), 0.0)
+    return pd.DataFrame({
+        "Data": date, "Sessioni": n.astype(int), "Profitto": profitto / 100,
+        "ROI": np.where(buyin > 0, profitto / np.where(buyin > 0, buyin, 1) * 100, 0.0),
+        "WinRate": vinte / n * 100, "Volatilita": np.sqrt(np.maximum(varianza, 0)) / 100,
+    })
+
+# --- TESTA A TESTA ---
+# Matrici sessione x giocatore (presenza e profitto) costruite dai codici delle righe;
+# tutte le coppie escono da due prodotti di matrici invece che da un giro per coppia:
+#   insieme = Pᵀ·P  -> sessioni giocate insieme (diagonale: sessioni di ciascuno)
+#   con     = Xᵀ·P  -> profitto di i nelle sessioni in cui c'era anche j
+# Una sessione è una data, come in SessioniClub. Senza scipy le matrici sono dense:
+# qualche centinaio di giocatori per qualche migliaio di sessioni sono pochi MB.
+
+def matrici_tavolo(partite):
+    attive = partite[partite["BuyIn"] > 0] if not partite.empty else partite
+    if attive.empty: return None
+    sessioni, _ = pd.factorize(attive["Data"], sort=True)
+    giocatori = attive["Giocatore"].cat.remove_unused_categories()
+    codici, nomi = giocatori.cat.codes.to_numpy(), giocatori.cat.categories
+    n_sess, n_gioc = sessioni.max() + 1, len(nomi)
+    cella = sessioni.astype(np.int64) * n_gioc + codici
+    presenza = (np.bincount(cella, minlength=n_sess * n_gioc) > 0).astype(np.float32).reshape(n_sess, n_gioc)
+    profitto = np.bincount(cella, weights=attive["Profitto"].to_numpy(dtype=float), minlength=n_sess * n_gioc).reshape(n_sess, n_gioc)
+    return {"giocatori": nomi, "insieme": (presenza.T @ presenza).astype(np.int64), "con": profitto.T @ presenza.astype(float)}
+
+def testa_a_testa(matrici):
+    # DataFrame giocatore x avversario; importi in euro, medie per sessione
+    insieme, con, nomi = matrici["insieme"], matrici["con"], matrici["giocatori"]
+    sessioni, totale = np.diag(insieme).astype(float), np.diag(con)
+    senza = sessioni[:, None] - insieme
+    media_con = np.divide(con, insieme, out=np.full(con.shape, np.nan), where=insieme > 0) / 100
+    media_senza = np.divide(totale[:, None] - con, senza, out=np.full(con.shape, np.nan), where=senza > 0) / 100
+    unione = sessioni[:, None] + sessioni[None, :] - insieme
+    tabella = lambda m: pd.DataFrame(m, index=pd.Index(nomi.astype(str), name="Giocatore"), columns=pd.Index(nomi.astype(str), name="Avversario"))
+    return {
+        "Sessioni": pd.Series(sessioni.astype(int), index=pd.Index(nomi.astype(str), name="Giocatore")),
+        "Insieme": tabella(insieme), "Affinita": tabella(np.divide(insieme, unione, out=np.zeros(con.shape), where=unione > 0) * 100),
+        "ProfittoCon": tabella(con / 100), "MediaCon": tabella(media_con), "MediaSenza": tabella(media_senza), "Differenza": tabella(media_con - media_senza),
+    }
+
+# --- STORICO PAGINATO ---
+# Indice delle righe in ordine di data, tenuto aggiornato dal CuboPartite insieme alle
+# date già ordinate. L'intervallo di date è una ricerca binaria, giocatore e testo si
+# confrontano sui codici delle categorie: l'app converte e mostra solo la pagina visibile.
+
+RIGHE_PER_PAGINA = 50
+
+def indice_date(partite, indice=None):
+    # (posizioni in ordine di data crescente, date ordinate); le righe nuove in coda a un
+    # indice esistente si aggiungono senza riordinare se non sono più vecchie dell'ultima
+    if partite.empty: return np.array([], dtype=np.int64), np.array([], dtype="datetime64[ns]")
+    date = partite["Data"].to_numpy()
+    if indice is not None and 0 < len(indice[0]) < len(date):
+        da = len(indice[0])
+        nuove = da + np.argsort(date[da:], kind="stable")
+        if date[nuove[0]] >= indice[1][-1]:
+            return np.concatenate([indice[0], nuove]), np.concatenate([indice[1], date[nuove]])
+    ordine = np.argsort(date, kind="stable")
+    return ordine, date[ordine]
+
+def filtra_storico(partite, indice, giocatori=None, dal=None, al=None, testo=""):
+    # Posizioni delle righe che passano i filtri, dalla più recente
+    ordine, date = indice
+    inizio = 0 if dal is None else np.searchsorted(date, np.datetime64(dal), "left")
+    fine = len(date) if al is None else np.searchsorted(date, np.datetime64(al) + np.timedelta64(1, "D"), "left")
+    righe = ordine[inizio:fine][::-1]
+    categorie = partite["Giocatore"].cat.categories if len(righe) else pd.Index([])
+    ammessi = None
+    if giocatori:
+        ammessi = categorie.get_indexer(giocatori)
+    if testo:
+        trovati = np.flatnonzero(categorie.astype(str).str.contains(testo.strip(), case=False, regex=False))
+        ammessi = trovati if ammessi is None else np.intersect1d(ammessi, trovati)
+    if ammessi is not None:
+        righe = righe[np.isin(partite["Giocatore"].cat.codes.to_numpy()[righe], ammessi)]
+    return righe